@@ -0,0 +1,95 @@
+
+import hashlib
+import inspect
+import json
+import os
+import time
+
+CACHE_DIR = ".cache"
+
+# Bump to drop every cached parse, e.g. after a change parser_salt() can't see
+PARSE_VERSION = 1
+
+
+def cache_path(name):
+    return os.path.join(CACHE_DIR, name)
+
+
+def fingerprint(text):
+    # Collapse whitespace so re-indented markup doesn't look like a content change
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_cache(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def is_fresh(entry, now=None):
+    if not entry: return False
+    if now is None: now = time.time()
+    return entry.get("expires_at", 0) > now
+
+
+def parser_salt(*parts):
+    """Hash of the code and config a parse depends on.
+
+    Functions contribute their source, anything else its repr, so editing a
+    parser, a label list or a spec invalidates the entries it produced.
+    """
+    digest = hashlib.sha256(str(PARSE_VERSION).encode("utf-8"))
+    for part in parts:
+        if callable(part):
+            try:
+                part = inspect.getsource(part)
+            except (OSError, TypeError):
+                part = getattr(getattr(part, "__code__", None), "co_code", repr(part))
+        digest.update(part if isinstance(part, bytes) else repr(part).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class ParseCache:
+    # Content-addressed memo: parsed results from the previous run are keyed
+    # by the fingerprint of the section text they were parsed from, salted
+    # with the parser version so code changes don't serve stale parses.
+    def __init__(self, path, salt="", persist=True):
+        self.path = path
+        self.salt = salt
+        # A read-only memo (dry runs): saving it would drop every entry the run didn't see
+        self.persist = persist
+        self.previous = load_cache(path)
+        self.current = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, namespace, text):
+        return f"{namespace}:{self.salt}:{fingerprint(text)}"
+
+    def get(self, namespace, text):
+        key = self.key(namespace, text)
+        if key in self.previous:
+            self.hits += 1
+            self.current[key] = self.previous[key]
+            return self.previous[key]
+        self.misses += 1
+        return None
+
+    def put(self, namespace, text, result):
+        self.current[self.key(namespace, text)] = result
+        return result
+
+    def save(self):
+        # Only entries seen this run survive, so the file never outgrows the catalog
+        if self.persist: save_cache(self.path, self.current)
@@ -0,0 +1,122 @@
+
+import os
+import time
+import traceback
+from datetime import datetime
+
+from cache import cache_path, load_cache, save_cache
+from profiling import profile_phase
+
+CHECKPOINT_DIR = cache_path("checkpoints")
+CHECKPOINT_MAX_AGE = 12 * 60 * 60  # a good phase older than this is re-scraped on --resume
+
+
+class PartialPhase(Exception):
+    # Raised by a phase that got some data but hit errors on part of its pages
+    def __init__(self, data, errors):
+        super().__init__(f"{len(errors)} errors: {errors[0] if errors else ''}")
+        self.data = data
+        self.errors = errors
+
+
+def checkpoint_file(carrier):
+    return os.path.join(CHECKPOINT_DIR, f"{carrier}.json")
+
+
+def load_checkpoints(carrier):
+    return load_cache(checkpoint_file(carrier))
+
+
+def merge_with_good(data, good):
+    # Fill what a partial run is missing from the last good checkpoint, flagging it stale
+    if isinstance(data, list):
+        seen = {(i.get("model"), i.get("storage")) for i in data}
+        merged = list(data)
+        for item in good:
+            if (item.get("model"), item.get("storage")) not in seen:
+                merged.append(dict(item, stale=True))
+        return merged
+    merged = dict(good)
+    merged.update(data)
+    return merged
+
+
+def mark_stale(data):
+    if isinstance(data, list):
+        return [dict(i, stale=True) for i in data]
+    return data
+
+
+async def run_phase(carrier, phase, fn, empty, resume=False, selected=True):
+    """Run one scrape phase and checkpoint its result.
+
+    Returns (data, stale). When the phase fails, the last good checkpoint is
+    served instead and stale is True; with no checkpoint yet, `empty` is used.
+    A phase that isn't `selected` is never run: its last good checkpoint is
+    served as is, whatever its age.
+    """
+    checkpoints = load_checkpoints(carrier)
+    entry = checkpoints.get(phase, {})
+    now = time.time()
+
+    if not selected:
+        if "data" not in entry:
+            print(f"Checkpoint: {carrier}/{phase} not selected and never scraped, using empty result")
+            return empty, False
+        print(f"Checkpoint: {carrier}/{phase} not selected, reusing result from {entry.get('updated_at')}")
+        if entry.get("status") != "ok":
+            return mark_stale(entry["data"]), True
+        return entry["data"], False
+
+    if resume and entry.get("status") == "ok" and now - entry.get("good_at", 0) < CHECKPOINT_MAX_AGE:
+        print(f"Checkpoint: reusing {carrier}/{phase} from {entry.get('updated_at')}")
+        return entry["data"], False
+
+    status = "ok"
+    error = None
+    stale = False
+    try:
+        async with profile_phase(carrier, phase):
+            data = await fn()
+    except PartialPhase as e:
+        print(f"Checkpoint: {carrier}/{phase} partial: {e}")
+        status, error = "partial", str(e)
+        data = e.data
+        if "data" in entry:
+            data = merge_with_good(data, entry["data"])
+            stale = True
+    except Exception as e:
+        print(f"Checkpoint: {carrier}/{phase} failed: {e}")
+        traceback.print_exc()
+        status, error = "failed", str(e)
+        data = entry.get("data")
+        if data is None:
+            data = empty
+        else:
+            data = mark_stale(data)
+            stale = True
+
+    record = {
+        "status": status,
+        "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "error": error,
+    }
+    if status == "ok":
+        record["good_at"] = now
+        record["data"] = data
+    elif "data" in entry:
+        # Keep serving the last good result until a clean run replaces it
+        record["good_at"] = entry.get("good_at")
+        record["data"] = entry["data"]
+    checkpoints[phase] = record
+    save_cache(checkpoint_file(carrier), checkpoints)
+    return data, stale
+
+
+def stale_phases(carriers):
+    stale = []
+    for carrier in carriers:
+        for phase, entry in load_checkpoints(carrier).items():
+            if entry.get("status") != "ok":
+                stale.append({"carrier": carrier, "phase": phase, "status": entry.get("status"), "updated_at": entry.get("updated_at")})
+    return stale
@@ -16,6 +16,13 @@ window.mountIPhoneMonitor = function (container, config) {
     }
     const BASE_URL = baseUrl;
 
+    // Optional live API (python server.py): filtered queries + SSE deltas
+    let apiUrl = config.apiUrl || '';
+    if (apiUrl && !apiUrl.endsWith('/')) {
+        apiUrl += '/';
+    }
+    const API_URL = apiUrl;
+
     // --- 2. State (Scoped to this instance) ---
     const INITIAL_DISPLAY_COUNT = 5;
     const LOAD_INCREMENT = 5;
@@ -37,15 +44,25 @@ window.mountIPhoneMonitor = function (container, config) {
     // --- 4. Initialization ---
 
     function init() {
+        // Keep cards prerendered into widget.html (prerender.py) across the re-render
+        const prerenderedList = container.querySelector('#mobile-list[data-prerendered]');
         // Inject HTML
         renderAppStructure();
         // Grab References
         grabElements();
+        if (prerenderedList) hydrate(prerenderedList);
         // Fetch & Setup
         fetchData();
         setupEventListeners();
     }
 
+    function hydrate(prerenderedList) {
+        mobileListEl.replaceWith(prerenderedList);
+        mobileListEl = prerenderedList;
+        if (loadingEl) loadingEl.classList.add('hidden');
+        if (productContainerEl) productContainerEl.classList.remove('hidden');
+    }
+
     // --- 5. Core Functions ---
 
     function renderAppStructure() {
@@ -220,22 +237,38 @@ window.mountIPhoneMonitor = function (container, config) {
         displayedCount = INITIAL_DISPLAY_COUNT;
     }
 
+    // Snapshot version the page shows (api/items only) and the live update stream
+    let loadedVersion = null;
+    let eventSource = null;
+
     async function fetchData() {
         try {
-            const response = await fetch(BASE_URL + 'data.json');
+            const dataUrl = API_URL ? API_URL + 'api/items' : BASE_URL + 'data.json';
+            const response = await fetch(dataUrl);
             if (!response.ok) throw new Error(`HTTP error! status: ${response.status} `);
             const data = await response.json();
 
             if (updatedAtEl) updatedAtEl.textContent = data.updated_at || '不明';
 
             allData = data.items;
+            loadedVersion = data.version || null;
 
             populateFilterChips(allData);
             markLowestPrices(allData);
 
             if (loadingEl) loadingEl.classList.add('hidden');
             if (productContainerEl) productContainerEl.classList.remove('hidden');
-            render();
+
+            // Prerendered cards from the same snapshot are already the default view
+            const prerendered = mobileListEl && mobileListEl.dataset.updatedAt;
+            if (prerendered && prerendered === data.updated_at) {
+                delete mobileListEl.dataset.updatedAt;
+                updateListControls(getFilteredItems().length);
+            } else {
+                render();
+            }
+
+            if (API_URL && !eventSource) subscribeUpdates();
 
         } catch (err) {
             console.error(err);
@@ -245,6 +278,44 @@ window.mountIPhoneMonitor = function (container, config) {
         }
     }
 
+    function subscribeUpdates() {
+        if (!window.EventSource) return;
+        const source = eventSource = new EventSource(API_URL + 'api/events');
+        // Sent on every (re)connect: deltas published while we weren't
+        // connected are gone, so catch up with a full reload
+        source.addEventListener('hello', (e) => {
+            try {
+                const hello = JSON.parse(e.data);
+                if (hello.version && hello.version !== loadedVersion) fetchData();
+            } catch (err) {
+                console.error('iPhone Monitor: bad hello', err);
+            }
+        });
+        source.addEventListener('delta', (e) => {
+            try {
+                applyDelta(JSON.parse(e.data));
+            } catch (err) {
+                console.error('iPhone Monitor: bad delta', err);
+            }
+        });
+    }
+
+    function applyDelta(delta) {
+        // Items are keyed like server.py's item_key; changed items keep their position
+        const keyOf = (i) => `${i.carrier}|${i.model}|${i.storage}`;
+        const byKey = new Map(allData.map(i => [keyOf(i), i]));
+        (delta.removed || []).forEach(k => byKey.delete(k));
+        [...(delta.added || []), ...(delta.changed || [])].forEach(i => byKey.set(keyOf(i), i));
+        allData = Array.from(byKey.values());
+        if (delta.version) loadedVersion = delta.version;
+
+        if (updatedAtEl && delta.updated_at) updatedAtEl.textContent = delta.updated_at;
+
+        populateFilterChips(allData);
+        markLowestPrices(allData);
+        render();
+    }
+
     function populateFilterChips(items) {
         const modelContainer = container.querySelector('#filter-model-container');
         const storageContainer = container.querySelector('#filter-storage-container');
@@ -366,7 +437,7 @@ window.mountIPhoneMonitor = function (container, config) {
         render();
     }
 
-    function render() {
+    function getFilteredItems() {
         let filtered = allData.filter(item => {
             if (!carriers.includes(item.carrier)) return false;
             if (selectedModel !== 'All' && item.model !== selectedModel) return false;
@@ -392,27 +463,17 @@ window.mountIPhoneMonitor = function (container, config) {
             }
         });
 
-        const currentFilteredData = filtered;
-
-        if (mobileListEl) mobileListEl.innerHTML = '';
-
-        if (currentFilteredData.length === 0) {
-            if (productContainerEl) productContainerEl.classList.add('hidden');
-            if (noResultsEl) noResultsEl.classList.remove('hidden');
-            if (loadMoreBtn) loadMoreBtn.classList.add('hidden');
-            return;
-        } else {
-            if (productContainerEl) productContainerEl.classList.remove('hidden');
-            if (noResultsEl) noResultsEl.classList.add('hidden');
-        }
+        return filtered;
+    }
 
-        const hasMore = currentFilteredData.length > displayedCount;
+    function updateListControls(total) {
+        const hasMore = total > displayedCount;
         const isExpanded = displayedCount > INITIAL_DISPLAY_COUNT;
 
         if (loadMoreBtn) {
             if (hasMore) {
                 loadMoreBtn.classList.remove('hidden');
-                loadMoreBtn.textContent = `もっと見る（あと${currentFilteredData.length - displayedCount}件）`;
+                loadMoreBtn.textContent = `もっと見る（あと${total - displayedCount}件）`;
             } else {
                 loadMoreBtn.classList.add('hidden');
             }
@@ -425,6 +486,24 @@ window.mountIPhoneMonitor = function (container, config) {
                 closeListBtn.classList.add('hidden');
             }
         }
+    }
+
+    function render() {
+        const currentFilteredData = getFilteredItems();
+
+        if (mobileListEl) mobileListEl.innerHTML = '';
+
+        if (currentFilteredData.length === 0) {
+            if (productContainerEl) productContainerEl.classList.add('hidden');
+            if (noResultsEl) noResultsEl.classList.remove('hidden');
+            if (loadMoreBtn) loadMoreBtn.classList.add('hidden');
+            return;
+        } else {
+            if (productContainerEl) productContainerEl.classList.remove('hidden');
+            if (noResultsEl) noResultsEl.classList.add('hidden');
+        }
+
+        updateListControls(currentFilteredData.length);
 
         const visibleItems = currentFilteredData.slice(0, displayedCount);
 
@@ -0,0 +1,228 @@
+
+import dataclasses
+import re
+from dataclasses import dataclass, field
+
+from throttle import scheduler
+
+# Tried in order; the first selector that matches anything wins, else <body>
+DEFAULT_TEXT_ROOTS = ["main", "[role='main']", "#main", "article"]
+
+# innerText already leaves out <script>/<style> and hidden nodes; roots nested
+# inside another matched root are dropped so their text isn't counted twice.
+_PROJECT_TEXT_JS = """
+(roots) => {
+    let nodes = [];
+    for (const sel of roots) {
+        nodes = Array.from(document.querySelectorAll(sel));
+        if (nodes.length) break;
+    }
+    if (!nodes.length && document.body) nodes = [document.body];
+    nodes = nodes.filter(n => !nodes.some(o => o !== n && o.contains(n)));
+    return nodes.map(n => n.innerText || '').join('\\n');
+}
+"""
+
+_STASH_TEXT_JS = "(roots) => { window.__iphoneMonitorText = (" + _PROJECT_TEXT_JS + ")(roots); return window.__iphoneMonitorText.length; }"
+_SLICE_TEXT_JS = "([start, size]) => window.__iphoneMonitorText.slice(start, start + size)"
+_CLEAR_TEXT_JS = "() => { delete window.__iphoneMonitorText; }"
+
+
+async def iter_visible_text(page, roots=None, chunk_size=64 * 1024):
+    # Visible text of the page's content roots, handed over in slices so huge
+    # pages never cross the driver connection as one string
+    length = await page.evaluate(_STASH_TEXT_JS, roots or DEFAULT_TEXT_ROOTS)
+    try:
+        for start in range(0, length, chunk_size):
+            yield await page.evaluate(_SLICE_TEXT_JS, [start, chunk_size])
+    finally:
+        await page.evaluate(_CLEAR_TEXT_JS)
+
+
+async def finditer_chunks(chunks, pattern, overlap=512):
+    """re.finditer over an async stream of text chunks.
+
+    A match is only reported once it ends at least `overlap` characters
+    before the end of what has been read, so matches straddling a chunk
+    boundary are still found. Patterns must match less than `overlap` chars.
+    """
+    regex = re.compile(pattern)
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk
+        cut = max(0, len(buffer) - overlap)
+        keep_from = cut
+        for m in regex.finditer(buffer):
+            if m.end() > cut:
+                keep_from = min(cut, m.start())
+                break
+            yield m
+        buffer = buffer[keep_from:]
+    for m in regex.finditer(buffer):
+        yield m
+
+
+# --- Declarative page specs -------------------------------------------------
+#
+# A PageSpec describes one page: where it lives, what to wait for, and a tree
+# of fields. extract_page() ships the whole tree to the browser and reads every
+# field in a single evaluate call; parsers then run on the returned strings in
+# Python. Fixing a selector or adding a page is a spec edit, not new code.
+
+
+@dataclass
+class Field:
+    """One value read relative to the enclosing group element.
+
+    selector  CSS selector; "" is the group element itself
+    attr      "text" (textContent), "inner_text", "visible_text" (innerText of
+              all matches, nested matches dropped) or an attribute name
+    parser    key into PARSERS, applied in Python
+    fallbacks selectors tried in order when the previous one matches nothing
+              or only blank values
+    all       every match as a list (blanks kept, so table columns line up)
+    contains  only values containing this text count as a match
+    """
+    selector: str = ""
+    attr: str = "text"
+    parser: str = "strip"
+    fallbacks: list = field(default_factory=list)
+    all: bool = False
+    contains: str = ""
+    kind: str = field(default="field", init=False)
+
+
+@dataclass
+class Group:
+    """Repeated block: one dict of `fields` per matching element.
+
+    sibling      read the fields from the first following sibling matching
+                 this selector (elements without one are skipped); "" fields
+                 still refer to the matched element
+    fingerprint  also return the block's text as "_text" for ParseCache keys;
+                 it doesn't change when a selector does, so callers salt the
+                 cache with compile_spec(spec) too
+    """
+    selector: str
+    fields: dict
+    fallbacks: list = field(default_factory=list)
+    sibling: str = ""
+    fingerprint: bool = False
+    kind: str = field(default="group", init=False)
+
+
+@dataclass
+class PageSpec:
+    name: str
+    url: str = ""
+    ready: str = ""             # selector to wait for before extracting
+    ready_timeout: int = 10000  # ms; extraction still runs if it never shows up
+    settle_ms: int = 0          # extra wait for late client-side rendering
+    fields: dict = field(default_factory=dict)
+    labels: dict = field(default_factory=dict)  # row/label keywords for the carrier's parser
+
+
+def parse_price(text):
+    m = re.search(r'(\d[\d,]*)', text or "")
+    if m: return int(m.group(1).replace(',', ''))
+    return 0
+
+
+PARSERS = {
+    "raw": lambda v: v or "",
+    "strip": lambda v: (v or "").strip(),
+    "price": parse_price,
+}
+
+_EXTRACT_JS = """
+(spec) => {
+    const read = (el, attr) => {
+        if (attr === 'text') return el.textContent || '';
+        if (attr === 'inner_text') return el.innerText || '';
+        return el.getAttribute(attr);
+    };
+    const field = (root, scope, f) => {
+        for (const sel of [f.selector, ...f.fallbacks]) {
+            const els = sel === '' ? [root] : Array.from(scope.querySelectorAll(sel));
+            if (!els.length) continue;
+            if (f.attr === 'visible_text') {
+                const outer = els.filter(n => !els.some(o => o !== n && o.contains(n)));
+                return outer.map(n => n.innerText || '').join('\\n');
+            }
+            if (f.all) return els.map(el => read(el, f.attr) || '');
+            for (const el of els) {
+                const v = read(el, f.attr);
+                if (v && v.trim() && (!f.contains || v.includes(f.contains))) return v;
+            }
+        }
+        return f.all ? [] : null;
+    };
+    const group = (scope, g) => {
+        let els = [];
+        for (const sel of [g.selector, ...g.fallbacks]) {
+            els = Array.from(scope.querySelectorAll(sel));
+            if (els.length) break;
+        }
+        const out = [];
+        for (const el of els) {
+            let inner = el;
+            if (g.sibling) {
+                inner = el.nextElementSibling;
+                while (inner && !inner.matches(g.sibling)) inner = inner.nextElementSibling;
+                if (!inner) continue;
+            }
+            const item = fields(el, inner, g.fields);
+            if (g.fingerprint) item._text = inner === el ? el.textContent : el.textContent + '\\n' + inner.textContent;
+            out.push(item);
+        }
+        return out;
+    };
+    const fields = (root, scope, defs) => {
+        const out = {};
+        for (const [name, d] of Object.entries(defs)) out[name] = d.kind === 'group' ? group(scope, d) : field(root, scope, d);
+        return out;
+    };
+    return fields(document.documentElement, document, spec.fields);
+}
+"""
+
+
+def compile_spec(spec):
+    """JSON payload for the in-page extractor."""
+    return {"name": spec.name, "fields": {k: dataclasses.asdict(v) for k, v in spec.fields.items()}}
+
+
+def parse_fields(defs, raw):
+    out = {}
+    for name, d in defs.items():
+        value = raw.get(name)
+        if isinstance(d, Group):
+            out[name] = []
+            for item in value or []:
+                parsed = parse_fields(d.fields, item)
+                if "_text" in item: parsed["_text"] = item["_text"]
+                out[name].append(parsed)
+        elif d.all:
+            out[name] = [PARSERS[d.parser](v) for v in value or []]
+        else:
+            out[name] = PARSERS[d.parser](value)
+    return out
+
+
+async def extract_page(page, spec, url=None):
+    """Navigate to the spec's page and read all of its fields in one call."""
+    await scheduler.goto(page, url or spec.url, wait_until="domcontentloaded")
+    if spec.ready:
+        try:
+            await page.wait_for_selector(spec.ready, timeout=spec.ready_timeout)
+        except Exception:
+            print(f"  {spec.name}: '{spec.ready}' not ready after {spec.ready_timeout}ms, extracting anyway")
+    if spec.settle_ms:
+        await page.wait_for_timeout(spec.settle_ms)
+    return await read_page(page, spec)
+
+
+async def read_page(page, spec):
+    """Read the spec's fields from the page as it is now, e.g. after a click."""
+    raw = await page.evaluate(_EXTRACT_JS, compile_spec(spec))
+    return parse_fields(spec.fields, raw)
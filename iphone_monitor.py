@@ -0,0 +1,122 @@
+
+import argparse
+import asyncio
+import random
+
+from session import SESSION_MODES
+
+# python -m iphone_monitor <command>
+#
+#   scrape  [--carrier rakuten,ahamo] [--phase stock,fee] ...   browser scrape, merged into data.json
+#   parse   --carrier rakuten --phase fee saved.html [--write]  same extraction on saved HTML, no browser
+#   merge   [PARTIAL ...]                                        merge shard results into data.json
+#
+# main.py (and through it Playwright) is only imported once a command runs,
+# and Playwright itself only when a scrape actually opens a browser.
+
+
+def split_list(value):
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+def wants_profile(args):
+    # Traces are written into the profile bundle, so --trace turns profiling on
+    return args.profile or args.trace or random.random() < args.profile_sample
+
+
+def cmd_scrape(args, parser):
+    import main
+    try:
+        carriers, phases = main.select_phases(split_list(args.carrier), split_list(args.phase))
+    except ValueError as e:
+        parser.error(str(e))
+    profile = wants_profile(args)
+    print(f"Scraping {', '.join(carriers)} ({', '.join(sorted(phases)) if phases else 'all phases'})")
+    if args.workers > 0:
+        main.run_workers(args.workers, args.resume, profile, args.trace, args.session, carriers, phases)
+    else:
+        asyncio.run(main.main(args.resume, profile, args.trace, args.session, carriers, phases))
+
+
+def cmd_shard(args, parser):
+    # One run_workers process: scrape a single carrier into a partial file
+    import main
+    try:
+        _, phases = main.select_phases([args.carrier], split_list(args.phase))
+    except ValueError as e:
+        parser.error(str(e))
+    main.run_shard(args.carrier, args.out or main.partial_path(args.carrier), args.resume,
+                   wants_profile(args), args.trace, args.session, phases)
+
+
+def cmd_parse(args, parser):
+    import main
+    try:
+        asyncio.run(main.run_parse(args.carrier, args.phase, args.html, args.url, args.write))
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+
+
+def cmd_merge(args, parser):
+    import main
+    main.run_merge(args.partials or None)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m iphone_monitor",
+                                     description="Scrape iPhone prices into docs/data.json")
+    # shard is internal to scrape --workers, so it's left out of the listing
+    commands = parser.add_subparsers(dest="command", required=True, metavar="{scrape,parse,merge}")
+
+    # Shared by scrape and the shard processes it starts
+    browser = argparse.ArgumentParser(add_help=False)
+    browser.add_argument("--phase", help="comma-separated phases to run; the rest reuse their last checkpoint")
+    browser.add_argument("--resume", action="store_true",
+                         help="also reuse selected phases whose last checkpoint is good and recent")
+    browser.add_argument("--profile", action="store_true",
+                         help="profile each phase and write a bundle with a hot-spot summary under profiles/")
+    browser.add_argument("--profile-sample", type=float, default=0.0, metavar="RATE",
+                         help="profile this fraction of runs (e.g. 0.1)")
+    browser.add_argument("--trace", action="store_true",
+                         help="record a Playwright trace per carrier (implies --profile)")
+    browser.add_argument("--session", choices=SESSION_MODES, default="none",
+                         help="keep browser state between runs (see session.py)")
+
+    scrape = commands.add_parser("scrape", parents=[browser],
+                                 help="scrape carriers with a browser and merge into data.json")
+    scrape.add_argument("--carrier", help="comma-separated carriers (default: every carrier with a selected phase)")
+    scrape.add_argument("--workers", type=int, default=0,
+                        help="scrape each carrier in its own process with its own browser, N at a time")
+    scrape.set_defaults(run=cmd_scrape)
+
+    shard = commands.add_parser("shard", parents=[browser])
+    shard.add_argument("carrier")
+    shard.add_argument("--out", help="partial result path (default: .cache/partials/<carrier>.json)")
+    shard.set_defaults(run=cmd_shard)
+
+    parse = commands.add_parser("parse", help="run one phase's extraction on saved HTML, without a browser")
+    parse.add_argument("--carrier", required=True)
+    parse.add_argument("--phase", required=True)
+    parse.add_argument("html", nargs="+", help="saved page(s), e.g. page.content() dumps")
+    parse.add_argument("--url", action="append",
+                       help="URL each saved page came from, repeated in file order; "
+                            "required for pages without a fixed URL (uq/models)")
+    parse.add_argument("--write", action="store_true",
+                       help="checkpoint the result and merge it into data.json (default: print only)")
+    parse.set_defaults(run=cmd_parse)
+
+    merge = commands.add_parser("merge", help="merge partial result files into data.json")
+    merge.add_argument("partials", nargs="*", metavar="PARTIAL",
+                       help="partial files (default: all in .cache/partials)")
+    merge.set_defaults(run=cmd_merge)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    args.run(args, parser)
+
+
+if __name__ == "__main__":
+    main()
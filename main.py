@@ -1,523 +1,953 @@
 
 import asyncio
-from playwright.async_api import async_playwright
+import hashlib
 import json
-from datetime import datetime
+import os
 import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import ParseCache, cache_path, fingerprint, is_fresh, load_cache, parser_salt, save_cache
+from checkpoint import PartialPhase, load_checkpoints, run_phase, stale_phases
+from extract import compile_spec, extract_page, finditer_chunks, iter_visible_text, parse_price, read_page
+from merge import CARRIER_NAMES, current_partials, load_partials, merge_partials, partial_path, write_partial
+from offline import extract_html
+from prerender import prerender_widget
+from profiling import start_profiling, start_trace, stop_profiling, stop_trace
+from session import close_context, open_context
+from specs import AHAMO_DETAIL, AHAMO_LISTING, RAKUTEN_CAMPAIGN_INDEX, RAKUTEN_FEE, RAKUTEN_STOCK, UQ_INDEX, UQ_MODEL
+from throttle import scheduler
 
 DATA_FILE = "docs/data.json"
+AHAMO_DETAIL_CONCURRENCY = 3
+AHAMO_TIER_WINDOW = 600  # chars after a capacity label searched for its prices
+AHAMO_STOCK_WINDOW = 2000  # chars after a stock label searched when no stock block is found
+AHAMO_STORAGE_RE = r'(?<!\d)(64GB|128GB|256GB|512GB|1TB)'
+AHAMO_STOCK_RE = r'([^\s\d:：/()（）]{2,14})\s*[:：]?\s*(在庫あり|在庫なし|在庫わずか|残りわずか|入荷待ち|予約受付中)'
+AHAMO_SELECTOR_GAP_RE = r'[\s/|・、,]*'  # between capacity labels of a selector
+AHAMO_LABEL_GAP_RE = r'(?:[（(][^）)]*[）)]|[^\d]){0,20}'  # label to amount; skips notes like （23回分）
+AHAMO_OPTION_SETTLE_MS = 1500  # after selecting a capacity, for its prices to re-render
+
+CAMPAIGN_CACHE_FILE = cache_path("rakuten_campaigns.json")
+CAMPAIGN_CACHE_TTL = 24 * 60 * 60  # campaign amounts change roughly weekly
+
+def campaign_target_model(href):
+    if "iphone-16e" in href: return "iPhone 16e"
+    if "iphone-16" in href: return "iPhone 16"
+    return None
+
+async def scan_campaign_page(page):
+    # Streams the page's visible text: points are scanned and the content is
+    # fingerprinted chunk by chunk, without pulling the serialized DOM
+    digest = hashlib.sha256()
+    async def chunks():
+        async for chunk in iter_visible_text(page):
+            digest.update(chunk.encode("utf-8"))
+            yield chunk
+    points = 0
+    async for m in finditer_chunks(chunks(), r'([\d,]{4,})\s*ポイント'):
+        points = max(points, int(m.group(1).replace(',', '')))
+    return points, digest.hexdigest()
+
+async def revalidate_campaign(page, href, entry):
+    # Cheap HEAD check against the validators stored on the last full fetch
+    if not entry.get("etag") and not entry.get("last_modified"):
+        return False
+    try:
+        resp = await scheduler.fetch(page.request, "head", href)
+    except Exception as e:
+        print(f"  Camp HEAD failed {href}: {e}")
+        return False
+    etag = resp.headers.get("etag")
+    last_modified = resp.headers.get("last-modified")
+    if etag and etag == entry.get("etag"): return True
+    if last_modified and last_modified == entry.get("last_modified"): return True
+    return False
+
+async def scrape_rakuten_campaigns(page):
+    campaign_map = {}
+    cache = load_cache(CAMPAIGN_CACHE_FILE)
+    entries = cache.get("entries", {})
+    hits = misses = 0
+    errors = []
+    links = (await extract_page(page, RAKUTEN_CAMPAIGN_INDEX))["links"]
+    print(f"Rakuten Campaign: Found {len(links)} links")
+    
+    campaign_urls = []
+    for href in links:
+        if href and "point" in href and "iphone" in href:
+            if not href.startswith("http"):
+                href = "https://network.mobile.rakuten.co.jp" + href
+            if href in campaign_urls: continue
+            if campaign_target_model(href) is None: continue
+            campaign_urls.append(href)
+
+    # A changed link set means campaigns were added/removed: crawl everything again
+    link_set = fingerprint("\n".join(sorted(campaign_urls)))
+    if link_set != cache.get("link_set"):
+        if cache: print("  Campaign link set changed, full crawl")
+        entries = {}
+
+    now = time.time()
+    new_entries = {}
+    for href in campaign_urls:
+        target_model = campaign_target_model(href)
+        entry = entries.get(href)
+        try:
+            if is_fresh(entry, now):
+                hits += 1
+                print(f"  Campaign cache hit: {href}")
+                new_entries[href] = entry
+            elif entry and await revalidate_campaign(page, href, entry):
+                hits += 1
+                print(f"  Campaign cache hit (revalidated): {href}")
+                entry["expires_at"] = now + CAMPAIGN_CACHE_TTL
+                new_entries[href] = entry
+            else:
+                misses += 1
+                print(f"  Campaign cache miss: {href}")
+                if campaign_map.get(target_model, 0) > 40000: continue
+                
+                resp = await scheduler.goto(page, href, wait_until="domcontentloaded")
+                points, content_hash = await scan_campaign_page(page)
+                if entry and entry.get("fingerprint") != content_hash:
+                    print(f"  Campaign content changed: {href}")
+                headers = resp.headers if resp else {}
+                entry = {
+                    "model": target_model,
+                    "points": points,
+                    "fingerprint": content_hash,
+                    "etag": headers.get("etag"),
+                    "last_modified": headers.get("last-modified"),
+                    "fetched_at": now,
+                    "expires_at": now + CAMPAIGN_CACHE_TTL,
+                }
+                new_entries[href] = entry
+
+            points = entry.get("points", 0)
+            if points > campaign_map.get(target_model, 0):
+                campaign_map[target_model] = points
+                print(f"  Campaign: {target_model} -> {points} pts")
+        except Exception as e:
+            print(f"  Camp Error {href}: {e}")
+            errors.append(f"{href}: {e}")
+
+    save_cache(CAMPAIGN_CACHE_FILE, {"link_set": link_set, "entries": new_entries})
+
+    print(f"Rakuten Campaign: cache hits={hits} misses={misses}")
+    if errors: raise PartialPhase(campaign_map, errors)
+    return campaign_map
+
+def parse_rakuten_stock_area(colors):
+    capacities = {}
+    for cd in colors:
+        color_name = cd["color"]
+        if not color_name: continue
+        
+        for row in cd["rows"]:
+            cols = row["cells"]
+            if len(cols) < 2: continue
+            
+            cap_text, status_text = cols[0], cols[1]
+            
+            storage_match = re.search(r'(\d+)(GB|TB)', cap_text)
+            if not storage_match: continue
+            
+            storage = storage_match.group(0)
+            is_in_stock = "在庫あり" in status_text or "In stock" in status_text
+            
+            if storage not in capacities: 
+                capacities[storage] = []
+            
+            capacities[storage].append({
+                "color": color_name,
+                "stock_text": status_text.strip()[:20],
+                "stock_available": is_in_stock
+            })
+    return capacities
+
+def parse_rakuten_fee_section(i, section, labels=RAKUTEN_FEE.labels):
+    # Returns {} for sections that carry no iPhone price table
+    model_name = section["model"]
+    if not model_name:
+        print(f"  Section {i}: No header")
+        return {}
+    
+    if "iPhone" not in model_name:
+        # print(f"  Skip non-iPhone: {model_name}")
+        return {}
+    
+    print(f"  Processing: {model_name}")
+    
+    headers = section["headers"]
+    storages = [txt for txt in headers if "GB" in txt or "TB" in txt]
+    
+    if not storages:
+        print(f"    No storages found. Headers: {len(headers)}")
+        return {}
 
-async def scrape_rakuten(page):
-    print("Scraping Rakuten Mobile...")
-    items = []
+    price_map = {s: {"gross": 0, "program": 0, "rent": 0} for s in storages}
     
-    # --- 1. Scrape Campaign Points (Phase 5) ---
-    campaign_map = {} 
-    try:
-        camp_url = "https://network.mobile.rakuten.co.jp/product/iphone/"
-        await page.goto(camp_url, wait_until="domcontentloaded")
-        await page.wait_for_timeout(3000)
+    for row in section["rows"]:
+        header_text = row["label"]
+        if not header_text: continue
         
-        links = await page.locator("a[href*='campaign']").all()
-        print(f"Rakuten Campaign: Found {len(links)} links")
+        tds = row["cells"]
+        if len(tds) < len(storages): continue
         
-        visited_urls = set()
-        for link in links:
-            href = await link.get_attribute("href")
-            if href and "point" in href and "iphone" in href:
-                if not href.startswith("http"):
-                    href = "https://network.mobile.rakuten.co.jp" + href
-                
-                if href in visited_urls: continue
-                visited_urls.add(href)
-                
-                try:
-                    target_model = None
-                    if "iphone-16e" in href: target_model = "iPhone 16e"
-                    elif "iphone-16" in href: target_model = "iPhone 16"
-                    else: continue
-                    
-                    if campaign_map.get(target_model, 0) > 40000: continue
-                    
-                    await page.goto(href, wait_until="domcontentloaded")
-                    content = await page.content()
-                    matches = re.findall(r'([\d,]{4,})\s*ポイント', content)
-                    if matches:
-                        nums = [int(m.replace(',', '')) for m in matches]
-                        max_pts = max(nums)
-                        if max_pts > campaign_map.get(target_model, 0):
-                            campaign_map[target_model] = max_pts
-                            print(f"  Campaign: {target_model} -> {max_pts} pts")
-                except Exception as e:
-                    print(f"  Camp Error {href}: {e}")
-    except Exception as e:
-        print(f"Error scraping campaigns: {e}")
-
-    # --- 2. Scrape Stock (Phase 7) ---
+        # Logic A: Gross
+        if any(k in header_text for k in labels["gross"]):
+            for idx, txt in enumerate(tds[:len(storages)]):
+                gross = parse_price(txt)
+                if gross > 0:
+                    price_map[storages[idx]]["gross"] = gross
+                if "48回" in txt:
+                     m_inst = re.search(r'48回.*?([\d,]+)', txt)
+                     if m_inst:
+                         installment = int(m_inst.group(1).replace(',', ''))
+                         price_map[storages[idx]]["program_calc"] = installment * 24
+
+        # Logic B: Program Row
+        elif any(k in header_text for k in labels["program"]):
+            for idx, txt in enumerate(tds[:len(storages)]):
+                val = parse_price(txt)
+                if val > 0: price_map[storages[idx]]["program"] = val
+
+        # Logic C: Rent Row (Priority)
+        elif any(k in header_text for k in labels["rent"]):
+            for idx, txt in enumerate(tds[:len(storages)]):
+                val = parse_price(txt)
+                if val > 0: price_map[storages[idx]]["rent"] = val
+
+    return {"model": model_name, "storages": storages, "price_map": price_map}
+
+def rakuten_stock_map(data, persist=True):
     stock_map = {}
-    try:
-        url_stock = "https://network.mobile.rakuten.co.jp/product/iphone/stock/"
-        await page.goto(url_stock, wait_until="domcontentloaded")
-        await page.wait_for_timeout(3000)
-        
-        product_headers = await page.locator(".product-iphone-stock-Layout_Product-name").all()
-        print(f"Rakuten Stock: Found {len(product_headers)} products")
+    salt = parser_salt(parse_rakuten_stock_area, compile_spec(RAKUTEN_STOCK))
+    parse_cache = ParseCache(cache_path("parse_rakuten_stock.json"), salt, persist)
+    products = data["products"]
+    print(f"Rakuten Stock: Found {len(products)} products")
+    
+    for product in products:
+        model_name = product["model"]
         
-        for header in product_headers:
-            model_name = await header.text_content()
-            model_name = model_name.strip()
-            
-            area = header.locator("xpath=following-sibling::div[contains(@class, 'product-iphone-stock-Layout_Product-area')]").first
-            if await area.count() == 0: continue
-                
-            if model_name not in stock_map: stock_map[model_name] = {}
-            
-            color_details = await area.locator(".color-details").all()
-            for cd in color_details:
-                color_header = cd.locator(".c-Heading_Lv4, h4")
-                if await color_header.count() == 0: continue
-                
-                color_text = await color_header.first.text_content()
-                color_name = color_text.strip()
-                
-                table = cd.locator("table")
-                if await table.count() == 0: continue
-                
-                rows = await table.locator("tbody tr").all()
-                for row in rows:
-                    cols = await row.locator("td").all()
-                    if len(cols) < 2: continue
-                    
-                    cap_text = await cols[0].text_content()
-                    status_text = await cols[1].text_content()
-                    
-                    storage_match = re.search(r'(\d+)(GB|TB)', cap_text)
-                    if not storage_match: continue
-                    
-                    storage = storage_match.group(0)
-                    is_in_stock = "在庫あり" in status_text or "In stock" in status_text
-                    
-                    if storage not in stock_map[model_name]: 
-                        stock_map[model_name][storage] = []
-                    
-                    stock_map[model_name][storage].append({
-                        "color": color_name,
-                        "stock_text": status_text.strip()[:20],
-                        "stock_available": is_in_stock
-                    })
-            print(f"  Parsed stock for {model_name}: {len(stock_map[model_name])} capacities")
-    except Exception as e:
-        print(f"Error scraping Rakuten Stock: {e}")
+        # Unchanged stock areas reuse last run's parse instead of walking every row again
+        capacities = parse_cache.get("stock", product["_text"])
+        if capacities is None:
+            capacities = parse_cache.put("stock", product["_text"], parse_rakuten_stock_area(product["colors"]))
+
+        if model_name not in stock_map: stock_map[model_name] = {}
+        for storage, variants in capacities.items():
+            stock_map[model_name].setdefault(storage, []).extend(variants)
+        print(f"  Parsed stock for {model_name}: {len(stock_map[model_name])} capacities")
+
+    parse_cache.save()
+    print(f"Rakuten Stock: parse cache hits={parse_cache.hits} misses={parse_cache.misses}")
+    return stock_map
+
+async def scrape_rakuten_stock(page):
+    return rakuten_stock_map(await extract_page(page, RAKUTEN_STOCK))
+
+def rakuten_fee_sections(data, persist=True):
+    fee_sections = []
+    salt = parser_salt(parse_rakuten_fee_section, parse_price, RAKUTEN_FEE.labels, compile_spec(RAKUTEN_FEE))
+    parse_cache = ParseCache(cache_path("parse_rakuten_fee.json"), salt, persist)
+    sections = data["sections"]
+    print(f"Rakuten Fee: Found {len(sections)} sections")
+    
+    for i, section in enumerate(sections):
+        parsed = parse_cache.get("fee", section["_text"])
+        if parsed is None:
+            parsed = parse_cache.put("fee", section["_text"], parse_rakuten_fee_section(i, section))
+        if parsed: fee_sections.append(parsed)
 
-    # --- 3. Scrape Fees (New Phase 11 Logic) ---
-    try:
-        url = "https://network.mobile.rakuten.co.jp/product/iphone/fee/"
-        await page.goto(url, wait_until="domcontentloaded")
-        await page.wait_for_timeout(3000)
+    parse_cache.save()
+    print(f"Rakuten Fee: parse cache hits={parse_cache.hits} misses={parse_cache.misses}")
+    return fee_sections
 
-        sections = await page.locator(".product-iphone-Fee_Media").all()
-        if len(sections) == 0:
-            sections = await page.locator("section").all()
+async def scrape_rakuten_fees(page):
+    return rakuten_fee_sections(await extract_page(page, RAKUTEN_FEE))
 
-        print(f"Rakuten Fee: Found {len(sections)} sections")
+def build_rakuten_items(fee_sections, campaign_map, stock_map, stale=False):
+    items = []
+    for parsed in fee_sections:
+        model_name = parsed["model"]
+        storages = parsed["storages"]
+        price_map = parsed["price_map"]
         
-        # Define helper here
-        def extract_price(text):
-            m = re.search(r'([\d,]+)', text)
-            if m: return int(m.group(1).replace(',', ''))
-            return 0
-
-        for i, section in enumerate(sections):
-            name_el = section.locator("h3, .product-name, h2")
-            if await name_el.count() == 0:
-                print(f"  Section {i}: No header")
-                continue
+        added_count = 0
+        for s in storages:
+            pm = price_map[s]
+            p_gross = pm["gross"]
+            if p_gross == 0: continue
+
+            p_program = 0
+            if pm["program"] > 0: p_program = pm["program"]
+            elif "program_calc" in pm and pm["program_calc"] > 0: p_program = pm["program_calc"]
+            else: p_program = int(p_gross / 2)
             
-            raw_model = await name_el.first.text_content()
-            model_name = raw_model.strip()
+            p_effective_rent = pm["rent"] if pm["rent"] > 0 else p_program
+            p_effective_buyout = p_gross
             
-            if "iPhone" not in model_name:
-                # print(f"  Skip non-iPhone: {model_name}")
-                continue
-            
-            print(f"  Processing: {model_name}")
-            
-            table = section.locator("table")
-            if await table.count() == 0:
-                print("    No table")
-                continue
-            
-            headers = await table.locator("thead th").all()
-            storages = []
-            for th in headers:
-                txt = await th.text_content()
-                txt = txt.strip()
-                if "GB" in txt or "TB" in txt:
-                    storages.append(txt)
-            
-            if not storages:
-                print(f"    No storages found. Headers: {len(headers)}")
-                continue
+            points_awarded = 0
+            if model_name in campaign_map:
+                points_awarded = campaign_map[model_name]
+            elif "16e" in model_name and "iPhone 16e" in campaign_map:
+                    points_awarded = campaign_map["iPhone 16e"]
 
-            rows = await table.locator("tbody tr").all()
-            price_map = {s: {"gross": 0, "program": 0, "rent": 0} for s in storages}
+            if "16e" in model_name and points_awarded < 50000:
+                 points_awarded = 52352
+
+            if pm["rent"] == 0:
+                 p_effective_rent = p_effective_rent - points_awarded
             
-            for row in rows:
-                th = row.locator("th")
-                if await th.count() == 0: continue
-                header_text = await th.first.text_content()
-                header_text = header_text.strip()
-                
-                tds = await row.locator("td").all()
-                if len(tds) < len(storages): continue
-                
-                # Logic A: Gross
-                if any(k in header_text for k in ["楽天モバイル", "一括価格", "現金販売価格"]):
-                    for idx, td in enumerate(tds):
-                        if idx >= len(storages): break
-                        txt = await td.text_content()
-                        gross = extract_price(txt)
-                        if gross > 0:
-                            price_map[storages[idx]]["gross"] = gross
-                        if "48回" in txt:
-                             m_inst = re.search(r'48回.*?([\d,]+)', txt)
-                             if m_inst:
-                                 installment = int(m_inst.group(1).replace(',', ''))
-                                 price_map[storages[idx]]["program_calc"] = installment * 24
-
-                # Logic B: Program Row
-                elif any(k in header_text for k in ["買い替え超トクプログラム", "24回分"]):
-                    for idx, td in enumerate(tds):
-                        if idx >= len(storages): break
-                        val = extract_price(await td.text_content())
-                        if val > 0: price_map[storages[idx]]["program"] = val
-
-                # Logic C: Rent Row (Priority)
-                elif any(k in header_text for k in ["実質", "キャンペーン"]):
-                    for idx, td in enumerate(tds):
-                        if idx >= len(storages): break
-                        val = extract_price(await td.text_content())
-                        if val > 0: price_map[storages[idx]]["rent"] = val
+            if p_effective_rent < 0: p_effective_rent = 0
             
-            added_count = 0
-            for s in storages:
-                pm = price_map[s]
-                p_gross = pm["gross"]
-                if p_gross == 0: continue
-
-                p_program = 0
-                if pm["program"] > 0: p_program = pm["program"]
-                elif "program_calc" in pm and pm["program_calc"] > 0: p_program = pm["program_calc"]
-                else: p_program = int(p_gross / 2)
-                
-                p_effective_rent = pm["rent"] if pm["rent"] > 0 else p_program
-                p_effective_buyout = p_gross
-                
-                points_awarded = 0
-                if model_name in campaign_map:
-                    points_awarded = campaign_map[model_name]
-                elif "16e" in model_name and "iPhone 16e" in campaign_map:
-                        points_awarded = campaign_map["iPhone 16e"]
-
-                if "16e" in model_name and points_awarded < 50000:
-                     points_awarded = 52352
+            program_exemption = p_gross - p_program
+            if program_exemption < 0: program_exemption = 0
+            
+            item_variants = []
+            if model_name in stock_map and s in stock_map[model_name]:
+                    item_variants = stock_map[model_name][s]
+
+            item = {
+                "carrier": "Rakuten",
+                "model": model_name,
+                "storage": s,
+                "price_gross": p_gross,
+                "price_effective_rent": p_effective_rent,
+                "price_effective_buyout": p_effective_buyout - points_awarded,
+                "url": RAKUTEN_FEE.url,
+                "discount_official": 0,
+                "points_awarded": points_awarded,
+                "program_exemption": program_exemption,
+                "variants": item_variants
+            }
+            if stale or parsed.get("stale"): item["stale"] = True
+            items.append(item)
+            added_count += 1
+        
+        if added_count == 0:
+            print(f"    Warning: No items added for {model_name}. Map: {price_map}")
+    return items
 
-                if pm["rent"] == 0:
-                     p_effective_rent = p_effective_rent - points_awarded
-                
-                if p_effective_rent < 0: p_effective_rent = 0
-                
-                program_exemption = p_gross - p_program
-                if program_exemption < 0: program_exemption = 0
-                
-                item_variants = []
-                if model_name in stock_map and s in stock_map[model_name]:
-                        item_variants = stock_map[model_name][s]
+async def scrape_rakuten(page, resume=False, phases=None):
+    print("Scraping Rakuten Mobile...")
+    
+    # --- 1. Scrape Campaign Points (Phase 5) ---
+    campaign_map, campaign_stale = await run_phase("rakuten", "campaign", lambda: scrape_rakuten_campaigns(page), {}, resume,
+                                                   selected=phase_selected("campaign", phases))
 
-                items.append({
-                    "carrier": "Rakuten",
-                    "model": model_name,
-                    "storage": s,
-                    "price_gross": p_gross,
-                    "price_effective_rent": p_effective_rent,
-                    "price_effective_buyout": p_effective_buyout - points_awarded,
-                    "url": url,
-                    "discount_official": 0,
-                    "points_awarded": points_awarded,
-                    "program_exemption": program_exemption,
-                    "variants": item_variants
-                })
-                added_count += 1
-            
-            if added_count == 0:
-                print(f"    Warning: No items added for {model_name}. Map: {price_map}")
+    # --- 2. Scrape Stock (Phase 7) ---
+    stock_map, stock_stale = await run_phase("rakuten", "stock", lambda: scrape_rakuten_stock(page), {}, resume,
+                                             selected=phase_selected("stock", phases))
 
-    except Exception as e:
-        print(f"Error scraping Rakuten: {e}")
-        import traceback
-        traceback.print_exc()
+    # --- 3. Scrape Fees (New Phase 11 Logic) ---
+    fee_sections, _ = await run_phase("rakuten", "fee", lambda: scrape_rakuten_fees(page), [], resume,
+                                      selected=phase_selected("fee", phases))
 
+    # Items are rebuilt from the three phases every run, so a resumed fee phase
+    # still picks up fresh campaign points and stock
+    items = build_rakuten_items(fee_sections, campaign_map, stock_map, stale=campaign_stale or stock_stale)
     print(f"Rakuten: Found {len(items)} items")
     return items
 
 
-async def scrape_ahamo(page):
-    print("Scraping ahamo...")
-    items = []
+def label_pattern(keywords):
+    return "(?:" + "|".join(re.escape(k) for k in keywords) + ")"
+
+def build_ahamo_offer(model_name, storage, price_gross, price_effective_rent, discount_official, url, variants=None):
+    # ahamo d-point campaign?
+    # User request: "points_awarded"
+    # We can try to extract "d-point" from "Benefit" section if we want advanced logic.
+    # For now, initialize to 0 or check if previously extracted text has "point".
+    points_awarded = 0
+    
+    program_exemption = 0
+    price_effective_buyout = price_gross - discount_official - points_awarded
+    
+    if price_effective_rent > 0 and price_gross > 0:
+        # Exemption = Gross - Discount - Rent - Points?
+        # Usually Rent is calculated BEFORE points in ahamo display, OR points are separate.
+        # Let's assume Rent displayed is "after program", but points are separate cashback.
+        # So Effective Rent (User Def) = Displayed Rent - Points.
+        program_exemption = price_gross - discount_official - price_effective_rent
+        if program_exemption < 0: program_exemption = 0
+        
+        # Apply points to effective rent
+        price_effective_rent = price_effective_rent - points_awarded
+
+    if price_effective_rent == 0 and price_effective_buyout > 0:
+        price_effective_rent = price_effective_buyout
+
+    return {
+        "carrier": "ahamo",
+        "model": model_name,
+        "storage": storage,
+        "price_gross": price_gross,               
+        "discount_official": discount_official,   
+        "program_exemption": program_exemption, 
+        "points_awarded": points_awarded,
+        "price_effective_rent": price_effective_rent,      
+        "price_effective_buyout": price_effective_buyout,  
+        "variants": variants or [],
+        "url": url
+    }
+
+def ahamo_stock_text(text, stock_text, labels):
+    # The spec'd stock block if the page has one, else the text after a stock label
+    if stock_text: return stock_text
+    m = re.search(label_pattern(labels["stock"]), text)
+    return text[m.end():m.end() + AHAMO_STOCK_WINDOW] if m else ""
+
+def ahamo_tier_blocks(text, selected=None):
+    # (storage, start, end) of the text following each capacity label.
+    # Labels separated by nothing but whitespace are a capacity selector
+    # ("128GB 256GB 512GB"), not headings: what follows them belongs to the
+    # selected option, so it goes under `selected` or is dropped.
+    marks = list(re.finditer(AHAMO_STORAGE_RE, text))
+    blocks = []
+    run = []
+    for idx, mark in enumerate(marks):
+        end = marks[idx + 1].start() if idx + 1 < len(marks) else len(text)
+        run.append(mark.group(1))
+        if (idx + 1 < len(marks) and re.fullmatch(AHAMO_SELECTOR_GAP_RE, text[mark.end():end])
+                and marks[idx + 1].group(1) not in run):
+            continue
+        storage = run[0] if len(run) == 1 else selected
+        run = []
+        if storage: blocks.append((storage, mark.end(), end))
+    return blocks
+
+def parse_ahamo_stock(stock_text, labels, selected=None):
+    # Colour/stock pairs listed under a capacity heading belong to that tier;
+    # pairs before any capacity are for the selected one, if known, else dropped
+    first = re.search(AHAMO_STORAGE_RE, stock_text)
+    blocks = [(selected, 0, first.start() if first else len(stock_text))] if selected else []
+    variants = {}
+    for storage, start, end in blocks + ahamo_tier_blocks(stock_text, selected):
+        for m in re.finditer(AHAMO_STOCK_RE, stock_text[start:end]):
+            color, status = m.group(1), m.group(2)
+            if re.search(r'GB|TB', color, re.IGNORECASE) or any(k in color for k in labels["not_color"]): continue
+            tier = variants.setdefault(storage, [])
+            if any(v["color"] == color for v in tier): continue
+            tier.append({
+                "color": color,
+                "stock_text": status,
+                "stock_available": status in ("在庫あり", "在庫わずか", "残りわずか"),
+            })
+    return variants
+
+def parse_ahamo_detail(page_data, labels=AHAMO_DETAIL.labels, selected=None):
+    # Detail pages either list every capacity with its own price block, e.g.
+    # "256GB ... 150,000円 ... 割引 -22,000円 ... お客さま負担 70,000円", or show a
+    # capacity selector and one price block for the selected capacity. The
+    # latter only yields a tier when the caller says which option is selected.
+    text = page_data["text"]
+    tiers = {}
+    for storage, start, end in ahamo_tier_blocks(text, selected):
+        if storage in tiers: continue
+        block = text[start:min(end, start + AHAMO_TIER_WINDOW)]
+
+        amounts = [int(m.group(1).replace(',', '')) for m in re.finditer(r'([\d,]{4,})\s*円', block)]
+        amounts = [a for a in amounts if a >= 20000]
+        if not amounts: continue
+
+        rent_m = re.search(label_pattern(labels["rent"]) + AHAMO_LABEL_GAP_RE + r'([\d,]{4,})\s*円', block)
+        disc_m = re.search(label_pattern(labels["discount"]) + AHAMO_LABEL_GAP_RE + r'([\d,]{4,})\s*円', block)
+        tiers[storage] = {
+            "price_gross": max(amounts),
+            "price_effective_rent": int(rent_m.group(1).replace(',', '')) if rent_m else 0,
+            "discount_official": int(disc_m.group(1).replace(',', '')) if disc_m else 0,
+        }
+
+    variants = parse_ahamo_stock(ahamo_stock_text(text, page_data["stock"], labels), labels, selected)
+    for storage, tier in tiers.items():
+        tier["variants"] = variants.get(storage, [])
+    options = []
+    for option in page_data["options"]:
+        if re.fullmatch(AHAMO_STORAGE_RE, option.strip()) and option.strip() not in options:
+            options.append(option.strip())
+    return {"tiers": tiers, "options": options}
+
+async def select_ahamo_option(page, storage):
+    option = page.locator(AHAMO_DETAIL.fields["options"].selector).filter(
+        has_text=re.compile(r'^\s*' + re.escape(storage) + r'\s*$'))
+    await option.first.click()
+    await page.wait_for_timeout(AHAMO_OPTION_SETTLE_MS)
+
+async def scrape_ahamo_detail(context, card, parse_cache):
+    def parse(page_data, selected=None):
+        key = "\n".join([card["detail_url"], selected or "", page_data["text"], page_data["stock"]] + page_data["options"])
+        detail = parse_cache.get("detail", key)
+        if detail is None:
+            detail = parse_cache.put("detail", key, parse_ahamo_detail(page_data, selected=selected))
+        return detail
+
+    page = await context.new_page()
     try:
-        url = "https://ahamo.com/products/iphone/"
-        await page.goto(url, wait_until="domcontentloaded")
-        await page.wait_for_timeout(5000)
+        detail = parse(await extract_page(page, AHAMO_DETAIL, url=card["detail_url"]))
+        tiers = dict(detail["tiers"])
+        # Selector pages only print the selected capacity's prices: select each
+        # option in turn and read the block again
+        for storage in detail["options"]:
+            if storage in tiers: continue
+            await select_ahamo_option(page, storage)
+            tier = parse(await read_page(page, AHAMO_DETAIL), selected=storage)["tiers"].get(storage)
+            if tier is None: continue
+            if any(t["price_gross"] == tier["price_gross"] for t in tiers.values()):
+                # Same block as another option: the click didn't change the selection
+                print(f"  ahamo detail: selecting {storage} didn't change the prices on {card['detail_url']}")
+                continue
+            tiers[storage] = tier
+    finally:
+        await page.close()
+
+    return [build_ahamo_offer(card["model"], storage, t["price_gross"], t["price_effective_rent"],
+                              t["discount_official"], card["detail_url"], t["variants"])
+            for storage, t in tiers.items()]
+
+async def scrape_ahamo_details(page, cards):
+    # Bounded parallel crawl of the detail pages; the per-host scheduler still
+    # decides how many of these actually hit ahamo.com at once
+    salt = parser_salt(parse_ahamo_detail, parse_ahamo_stock, ahamo_tier_blocks, ahamo_stock_text, label_pattern,
+                       AHAMO_STORAGE_RE, AHAMO_STOCK_RE, AHAMO_SELECTOR_GAP_RE, AHAMO_LABEL_GAP_RE, AHAMO_DETAIL.labels,
+                       compile_spec(AHAMO_DETAIL))
+    parse_cache = ParseCache(cache_path("parse_ahamo_detail.json"), salt)
+    limit = asyncio.Semaphore(AHAMO_DETAIL_CONCURRENCY)
+    errors = []
+
+    async def crawl(card):
+        if not card.get("detail_url"):
+            return [{k: v for k, v in card.items() if k != "detail_url"}]
+        async with limit:
+            try:
+                offers = await scrape_ahamo_detail(page.context, card, parse_cache)
+            except Exception as e:
+                print(f"  ahamo detail failed {card['detail_url']}: {e}")
+                errors.append(f"{card['detail_url']}: {e}")
+                return []
+        if not offers:
+            print(f"  ahamo detail: no capacity prices on {card['detail_url']}")
+            errors.append(f"{card['detail_url']}: no capacity prices found")
+            return []
+        print(f"  ahamo detail: {card['model']} -> {', '.join(o['storage'] for o in offers)}")
+        return offers
+
+    results = await asyncio.gather(*(crawl(card) for card in cards))
+    parse_cache.save()
+    print(f"ahamo detail: parse cache hits={parse_cache.hits} misses={parse_cache.misses}")
+    offers = [offer for offers in results for offer in offers]
+    # Failed cards are left out: run_phase fills them from the last good tiers
+    if errors: raise PartialPhase(offers, errors)
+    return offers
+
+def parse_ahamo_card(card, url):
+    model_name = card["name"]
+    if not model_name:
+         return {}
+    
+    # Gross (定価), effective rent (実質負担) and official discount (割引)
+    price_gross = card["gross"]
+    price_effective_rent = card["rent"]
+    discount_official = card["discount"]
+    
+    # Storage (Inferred; the detail crawl replaces this with real tiers)
+    storage = "Wait for detail" 
+    if "15" in model_name or "16" in model_name or "17" in model_name:
+        storage = "128GB"
+    elif "SE" in model_name:
+        storage = "64GB"
+    else:
+        storage = "Unknown"
+
+    if price_gross == 0: return {}
+    item = build_ahamo_offer(model_name, storage, price_gross, price_effective_rent, discount_official, url)
+    href = card["href"]
+    if href:
+        item["detail_url"] = href if href.startswith("http") else "https://ahamo.com" + href
+    return item
+
+def ahamo_listing_items(data, persist=True):
+    items = []
+    cards = data["cards"]
+    print(f"ahamo: Found {len(cards)} links")
+    
+    salt = parser_salt(parse_ahamo_card, build_ahamo_offer, parse_price, compile_spec(AHAMO_LISTING))
+    parse_cache = ParseCache(cache_path("parse_ahamo.json"), salt, persist)
+    for card in cards:
+        card_text = card["href"] + "\n" + card["_text"]
+        item = parse_cache.get("card", card_text)
+        if item is None:
+            item = parse_cache.put("card", card_text, parse_ahamo_card(card, AHAMO_LISTING.url))
+        if item: items.append(item)
+
+    parse_cache.save()
+    print(f"ahamo: parse cache hits={parse_cache.hits} misses={parse_cache.misses}")
+    return items
 
-        links = await page.locator("a.a-product-thumbnail-link").all()
-        print(f"ahamo: Found {len(links)} links")
+async def scrape_ahamo_listing(page):
+    return ahamo_listing_items(await extract_page(page, AHAMO_LISTING))
+
+def ahamo_offers_from_details(cards, detail_items):
+    # Detail tiers for cards still listed (matched by detail URL); cards with
+    # no tiers, e.g. new or never crawled successfully, get their listing offer
+    by_url = {}
+    for item in detail_items:
+        by_url.setdefault(item["url"], []).append(item)
+    offers = []
+    for card in cards:
+        cached = by_url.get(card.get("detail_url"))
+        if cached:
+            offers.extend(dict(i, model=card["model"]) for i in cached)
+        else:
+            offers.append({k: v for k, v in card.items() if k != "detail_url"})
+    return offers
+
+async def scrape_ahamo(page, resume=False, phases=None):
+    print("Scraping ahamo...")
+    cards, _ = await run_phase("ahamo", "listing", lambda: scrape_ahamo_listing(page), [], resume,
+                               selected=phase_selected("listing", phases))
+    items, _ = await run_phase("ahamo", "detail", lambda: scrape_ahamo_details(page, cards), [], resume,
+                               selected=phase_selected("detail", phases))
+    # Checkpointed or partly failed detail runs may not cover every current card
+    items = ahamo_offers_from_details(cards, items)
+    print(f"ahamo: Found {len(items)} items")
+    return items
+
+def parse_uq_page(model_url, page_data, labels=UQ_MODEL.labels):
+    page_items = []
+    model_name = page_data["model"] or "Unknown iPhone"
+    content = page_data["text"]
+    
+    matches = re.finditer(r'(64|128|256|512|1T)GB.*?' + label_pattern(labels["gross"]) + r'\s*[:：]?\s*([\d,]+)円', content, re.DOTALL)
+    
+    discount_official = 0
+    disc_match = re.search(label_pattern(labels["discount"]) + r'.*?(-?[\d,]+)円', content)
+    if disc_match:
+        d_str = disc_match.group(1).replace(',', '').replace('-', '')
+        discount_official = int(d_str) 
+    else: 
+         discount_official = 22000
+    
+    # UQ Points? (au PAY)
+    points_awarded = 0
+    
+    found = False
+    for m in matches:
+        storage = m.group(1) + "GB"
+        if "T" in m.group(1): storage = "1TB"
         
-        for i, link in enumerate(links):
-            # Name
-            name_el = link.locator(".a-product-thumbnail__name")
-            if await name_el.count() == 0:
-                name_el = link.locator(".a-product-thumbnail-link__name")
-            
-            if await name_el.count() == 0:
-                 continue
-                 
-            model_name = await name_el.first.text_content()
-            model_name = model_name.strip()
-            
-            # --- Price Extraction V2 (Gross vs Effective) ---
-            
-            # 1. Gross Price (定価)
-            # Located in .a-product-thumbnail__price (e.g. 133,265)
-            price_gross = 0
-            gross_el = link.locator(".a-product-thumbnail__price .a-price-amount").first
-            if await gross_el.count() > 0:
-                raw = await gross_el.text_content()
-                m = re.search(r'([\d,]+)', raw)
-                if m: price_gross = int(m.group(1).replace(',', ''))
-
-            # 2. Effective Rent (実質負担)
-            # Located in Kaedoki section "Customer Burden"
-            price_effective_rent = 0
-            rent_el = link.locator(".a-product-thumbnail-link__kaedoki-campaign-content-price-item-price .a-price-amount").first
-            if await rent_el.count() > 0:
-                raw = await rent_el.text_content()
-                m = re.search(r'([\d,]+)', raw)
-                if m: price_effective_rent = int(m.group(1).replace(',', ''))
-            
-            # 3. Official Discount (割引)
-            discount_official = 0
-            disc_el = link.locator(".a-product-thumbnail-link__kaedoki-campaign-content-price-item-discount .a-price-amount").first
-            if await disc_el.count() > 0:
-                raw = await disc_el.text_content()
-                m = re.search(r'([\d,]+)', raw)
-                if m: discount_official = int(m.group(1).replace(',', ''))
-
-            # Fallback for old/simple cards
-            if price_gross == 0:
-                 fallback = link.locator(".a-product-thumbnail-link__price-number")
-                 if await fallback.count() > 0:
-                     raw = await fallback.first.text_content()
-                     m = re.search(r'([\d,]+)', raw)
-                     if m: price_gross = int(m.group(1).replace(',', ''))
-            
-            # 4. Calculation
-            # ahamo d-point campaign?
-            # User request: "points_awarded"
-            # We can try to extract "d-point" from "Benefit" section if we want advanced logic.
-            # For now, initialize to 0 or check if previously extracted text has "point".
-            points_awarded = 0
-            
-            program_exemption = 0
+        price_gross = int(m.group(2).replace(',', ''))
+        
+        program_exemption = 0
+        
+        price_effective_buyout = price_gross - discount_official - points_awarded
+        price_effective_rent = price_effective_buyout - program_exemption
+        if price_effective_rent < 0: price_effective_rent = 0
+
+        if not any(i['model'] == model_name and i['storage'] == storage for i in page_items):
+             page_items.append({
+                "carrier": "UQ mobile",
+                "model": model_name,
+                "storage": storage,
+                "price_gross": price_gross,
+                "discount_official": discount_official,
+                "program_exemption": program_exemption,
+                "points_awarded": points_awarded,
+                "price_effective_rent": price_effective_rent,
+                "price_effective_buyout": price_effective_buyout,
+                "variants": [],
+                "url": model_url
+            })
+             found = True
+    
+    if not found:
+        matches_v2 = re.finditer(r'(64|128|256|512|1T)GB.*?([\d,]{4,})円', content, re.DOTALL)
+        for m in matches_v2:
+            storage = m.group(1) + "GB"
+            if "T" in m.group(1): storage = "1TB"
+            price_gross = int(m.group(2).replace(',', ''))
+            if price_gross < 20000: continue
+
             price_effective_buyout = price_gross - discount_official - points_awarded
+            price_effective_rent = price_effective_buyout
             
-            if price_effective_rent > 0 and price_gross > 0:
-                # Exemption = Gross - Discount - Rent - Points?
-                # Usually Rent is calculated BEFORE points in ahamo display, OR points are separate.
-                # Let's assume Rent displayed is "after program", but points are separate cashback.
-                # So Effective Rent (User Def) = Displayed Rent - Points.
-                program_exemption = price_gross - discount_official - price_effective_rent
-                if program_exemption < 0: program_exemption = 0
-                
-                # Apply points to effective rent
-                price_effective_rent = price_effective_rent - points_awarded
-
-            if price_effective_rent == 0 and price_effective_buyout > 0:
-                price_effective_rent = price_effective_buyout
-
-            # Storage (Inferred)
-            storage = "Wait for detail" 
-            if "15" in model_name or "16" in model_name or "17" in model_name:
-                storage = "128GB"
-            elif "SE" in model_name:
-                storage = "64GB"
-            else:
-                storage = "Unknown"
-
-            if price_gross > 0:
-                 items.append({
-                    "carrier": "ahamo",
+            if not any(i['model'] == model_name and i['storage'] == storage for i in page_items):
+                 page_items.append({
+                    "carrier": "UQ mobile",
                     "model": model_name,
                     "storage": storage,
-                    "price_gross": price_gross,               
-                    "discount_official": discount_official,   
-                    "program_exemption": program_exemption, 
+                    "price_gross": price_gross,
+                    "discount_official": discount_official,
+                    "program_exemption": 0,
                     "points_awarded": points_awarded,
-                    "price_effective_rent": price_effective_rent,      
-                    "price_effective_buyout": price_effective_buyout,  
+                    "price_effective_rent": price_effective_rent,
+                    "price_effective_buyout": price_effective_buyout,
                     "variants": [],
-                    "url": url
+                    "url": model_url
                 })
 
-    except Exception as e:
-        print(f"Error scraping ahamo: {e}")
-        import traceback
-        traceback.print_exc()
-
-    print(f"ahamo: Found {len(items)} items")
-    return items
+    return page_items
 
-async def scrape_uq(page):
-    print("Scraping UQ mobile...")
+async def scrape_uq_models(page):
     items = []
-    try:
-        url = "https://www.uqwimax.jp/mobile/iphone/"
-        await page.goto(url, wait_until="domcontentloaded")
-        await page.wait_for_timeout(3000)
-
-        product_links = await page.locator("a[href*='/mobile/iphone/']").all()
-        hrefs = set()
-        for link in product_links:
-            href = await link.get_attribute("href")
-            if href and "iphone" in href and href.count('/') > 3:
-                if not href.startswith("http"):
-                    href = "https://www.uqwimax.jp" + href
-                hrefs.add(href)
-        
-        model_urls = [h for h in hrefs if re.search(r'/iphone/\d+|se', h)]
-        print(f"UQ: Found model URLs: {len(model_urls)}")
-
-        for model_url in model_urls:
-            try:
-                await page.goto(model_url, wait_until="domcontentloaded")
-                await page.wait_for_timeout(2000)
-                
-                model_name = ""
-                potential_headers = ["h1", ".product-name", "title"]
-                for ph in potential_headers:
-                    els = await page.locator(ph).all()
-                    for el in els:
-                        txt = await el.text_content()
-                        if "iPhone" in txt:
-                            model_name = txt.strip()
-                            break
-                    if model_name: break
-                
-                if not model_name: model_name = "Unknown iPhone"
-                
-                content = await page.content()
-                
-                matches = re.finditer(r'(64|128|256|512|1T)GB.*?機種代金\s*[:：]?\s*([\d,]+)円', content, re.DOTALL)
-                
-                discount_official = 0
-                disc_match = re.search(r'最大割引額.*?(-?[\d,]+)円', content)
-                if disc_match:
-                    d_str = disc_match.group(1).replace(',', '').replace('-', '')
-                    discount_official = int(d_str) 
-                else: 
-                     discount_official = 22000
-                
-                # UQ Points? (au PAY)
-                points_awarded = 0
-                
-                found = False
-                for m in matches:
-                    storage = m.group(1) + "GB"
-                    if "T" in m.group(1): storage = "1TB"
-                    
-                    price_gross = int(m.group(2).replace(',', ''))
-                    
-                    program_exemption = 0
-                    
-                    price_effective_buyout = price_gross - discount_official - points_awarded
-                    price_effective_rent = price_effective_buyout - program_exemption
-                    if price_effective_rent < 0: price_effective_rent = 0
-
-                    if not any(i['model'] == model_name and i['storage'] == storage for i in items):
-                         items.append({
-                            "carrier": "UQ mobile",
-                            "model": model_name,
-                            "storage": storage,
-                            "price_gross": price_gross,
-                            "discount_official": discount_official,
-                            "program_exemption": program_exemption,
-                            "points_awarded": points_awarded,
-                            "price_effective_rent": price_effective_rent,
-                            "price_effective_buyout": price_effective_buyout,
-                            "variants": [],
-                            "url": model_url
-                        })
-                         found = True
-                
-                if not found:
-                    matches_v2 = re.finditer(r'(64|128|256|512|1T)GB.*?([\d,]{4,})円', content, re.DOTALL)
-                    for m in matches_v2:
-                        storage = m.group(1) + "GB"
-                        if "T" in m.group(1): storage = "1TB"
-                        price_gross = int(m.group(2).replace(',', ''))
-                        if price_gross < 20000: continue
-
-                        price_effective_buyout = price_gross - discount_official - points_awarded
-                        price_effective_rent = price_effective_buyout
-                        
-                        if not any(i['model'] == model_name and i['storage'] == storage for i in items):
-                             items.append({
-                                "carrier": "UQ mobile",
-                                "model": model_name,
-                                "storage": storage,
-                                "price_gross": price_gross,
-                                "discount_official": discount_official,
-                                "program_exemption": 0,
-                                "points_awarded": points_awarded,
-                                "price_effective_rent": price_effective_rent,
-                                "price_effective_buyout": price_effective_buyout,
-                                "variants": [],
-                                "url": model_url
-                            })
+    errors = []
+    product_links = (await extract_page(page, UQ_INDEX))["links"]
+    hrefs = set()
+    for href in product_links:
+        if href and "iphone" in href and href.count('/') > 3:
+            if not href.startswith("http"):
+                href = "https://www.uqwimax.jp" + href
+            hrefs.add(href)
+    
+    model_urls = [h for h in hrefs if re.search(r'/iphone/\d+|se', h)]
+    print(f"UQ: Found model URLs: {len(model_urls)}")
 
-            except Exception as e:
-                print(f"UQ Error on {model_url}: {e}")
+    salt = parser_salt(parse_uq_page, label_pattern, UQ_MODEL.labels, compile_spec(UQ_MODEL))
+    parse_cache = ParseCache(cache_path("parse_uq.json"), salt)
 
-    except Exception as e:
-        print(f"Error scraping UQ: {e}")
+    for model_url in model_urls:
+        try:
+            page_data = await extract_page(page, UQ_MODEL, url=model_url)
+            
+            # Unchanged model pages reuse last run's offers; the regex scan only runs on changes
+            page_text = "\n".join([model_url, page_data["title"], page_data["model"], page_data["text"]])
+            page_items = parse_cache.get("page", page_text)
+            if page_items is None:
+                page_items = parse_cache.put("page", page_text, parse_uq_page(model_url, page_data))
+
+            for item in page_items:
+                if not any(i['model'] == item['model'] and i['storage'] == item['storage'] for i in items):
+                    items.append(item)
+
+        except Exception as e:
+            print(f"UQ Error on {model_url}: {e}")
+            errors.append(f"{model_url}: {e}")
+
+    parse_cache.save()
+    print(f"UQ: parse cache hits={parse_cache.hits} misses={parse_cache.misses}")
+    if errors: raise PartialPhase(items, errors)
+    return items
 
+async def scrape_uq(page, resume=False, phases=None):
+    print("Scraping UQ mobile...")
+    items, _ = await run_phase("uq", "models", lambda: scrape_uq_models(page), [], resume,
+                               selected=phase_selected("models", phases))
     print(f"UQ: Found {len(items)} items")
     return items
 
-async def main():
-    async with async_playwright() as p:
-        # Launch browser (headless=False for debug if needed, but usually True)
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            locale="ja-JP"
-        )
-        page = await context.new_page()
-
-        rakuten_data = await scrape_rakuten(page)
-        ahamo_data = await scrape_ahamo(page)
-        uq_data = await scrape_uq(page)
-
-        all_data = {
-            "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "items": rakuten_data + ahamo_data + uq_data
-        }
+SCRAPERS = {
+    "rakuten": scrape_rakuten,
+    "ahamo": scrape_ahamo,
+    "uq": scrape_uq,
+}
+
+# Phases of each scraper in run order; names are unique across carriers
+PHASES = {
+    "rakuten": ["campaign", "stock", "fee"],
+    "ahamo": ["listing", "detail"],
+    "uq": ["models"],
+}
+
+# Phases whose pages are spec'd, so they can also be run on saved HTML:
+# (carrier, phase) -> (spec, parse(extracted, url, persist) -> phase data, per_page)
+# persist is False for dry runs, which must leave the parse caches as they are.
+# A per_page phase is the union of many pages (one per URL): saved pages only
+# replace their own URLs' items in its checkpoint.
+OFFLINE_PHASES = {
+    ("rakuten", "stock"): (RAKUTEN_STOCK, lambda data, url, persist: rakuten_stock_map(data, persist), False),
+    ("rakuten", "fee"): (RAKUTEN_FEE, lambda data, url, persist: rakuten_fee_sections(data, persist), False),
+    ("ahamo", "listing"): (AHAMO_LISTING, lambda data, url, persist: ahamo_listing_items(data, persist), False),
+    ("uq", "models"): (UQ_MODEL, lambda data, url, persist: parse_uq_page(url, data), True),
+}
+
+def phase_selected(phase, phases=None):
+    return phases is None or phase in phases
+
+def select_phases(carriers=None, phases=None):
+    """Resolve --carrier/--phase into (carriers, phases); phases None means all.
+
+    Only carriers with at least one selected phase are kept, so
+    `--phase stock` alone means Rakuten.
+    """
+    carriers = list(carriers or PHASES)
+    unknown = [c for c in carriers if c not in PHASES]
+    if unknown:
+        raise ValueError(f"unknown carrier {', '.join(unknown)} (choose from {', '.join(PHASES)})")
+    if not phases:
+        return carriers, None
+    phases = set(phases)
+    known = {p for c in carriers for p in PHASES[c]}
+    if phases - known:
+        raise ValueError(f"unknown phase {', '.join(sorted(phases - known))} for {', '.join(carriers)} "
+                         f"(choose from {', '.join(sorted(known))})")
+    return [c for c in carriers if phases & set(PHASES[c])], phases
+
+async def scrape_partials(carriers, resume=False, profile=False, trace=False, session="none", phases=None):
+    # Imported here so parse-only and merge runs never load Playwright
+    from playwright.async_api import async_playwright
+
+    partials = {}
+    name = "_".join(carriers)
+    scheduler.reset()
+    if profile: start_profiling(name, trace=trace)
+    try:
+        async with async_playwright() as p:
+            context = await open_context(p, session, name)
+            try:
+                page = context.pages[0] if context.pages else await context.new_page()
+                for carrier in carriers:
+                    await start_trace(context)
+                    try:
+                        items = await SCRAPERS[carrier](page, resume, phases)
+                    finally:
+                        # A failed carrier's trace is the one worth keeping
+                        await stop_trace(context, carrier)
+                    partials[carrier] = {
+                        "carrier": carrier,
+                        "items": items,
+                        # Phases whose latest run failed; their items carry "stale": true
+                        "stale_phases": stale_phases([carrier])
+                    }
+            finally:
+                await close_context(context, session, name)
+    finally:
+        # Also on failure: the bundle gets written and the task factory uninstalled
+        scheduler.print_stats()
+        save_cache(cache_path(f"throttle_stats_{name}.json"), scheduler.stats())
+        stop_profiling({"throttle": scheduler.stats()})
+    return partials
+
+def load_previous_data():
+    try:
+        with open(DATA_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_data, f, indent=2, ensure_ascii=False)
-            
-        print(f"Data saved to {DATA_FILE}")
+def write_data(all_data):
+    if not all_data["items"]:
+        raise SystemExit("Refusing to write an empty snapshot to " + DATA_FILE)
+
+    with open(DATA_FILE, "w", encoding="utf-8") as f:
+        json.dump(all_data, f, indent=2, ensure_ascii=False)
         
-        await browser.close()
+    print(f"Data saved to {DATA_FILE} ({len(all_data['items'])} items)")
+    prerender_widget(all_data)
+
+async def main(resume=False, profile=False, trace=False, session="none", carriers=None, phases=None):
+    carriers = carriers or list(SCRAPERS)
+    partials = await scrape_partials(carriers, resume, profile, trace, session, phases)
+    write_data(merge_partials(partials, load_previous_data(), scope=carriers))
+
+def run_shard(carrier, out_path, resume=False, profile=False, trace=False, session="none", phases=None):
+    partial = asyncio.run(scrape_partials([carrier], resume, profile, trace, session, phases))[carrier]
+    write_partial(out_path, carrier, partial["items"], partial["stale_phases"])
+    print(f"Shard {carrier}: wrote {len(partial['items'])} items to {out_path}")
+
+def run_workers(workers, resume=False, profile=False, trace=False, session="none", carriers=None, phases=None):
+    # One OS process (and browser) per carrier, so a renderer crash or a slow
+    # site only costs that carrier's shard
+    carriers = carriers or list(SCRAPERS)
+    def launch(carrier):
+        out_path = partial_path(carrier)
+        if os.path.exists(out_path): os.remove(out_path)
+        cmd = [sys.executable, "-m", "iphone_monitor", "shard", carrier, "--out", out_path]
+        if resume: cmd.append("--resume")
+        if profile: cmd.append("--profile")
+        if trace: cmd.append("--trace")
+        if phases: cmd += ["--phase", ",".join(sorted(phases & set(PHASES[carrier])))]
+        cmd += ["--session", session]
+        result = subprocess.run(cmd, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            print(f"Worker {carrier} exited with {result.returncode}")
+        return out_path
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        paths = list(pool.map(launch, carriers))
+    # The shards were just written by this run, so they're merged without an age check
+    run_merge([p for p in paths if os.path.exists(p)], scope=carriers, trusted=True)
+
+def run_merge(paths=None, scope=None, trusted=False):
+    partials = load_partials(paths)
+    previous = load_previous_data()
+    if not trusted:
+        partials = current_partials(partials, previous)
+        if not partials:
+            print(f"Merge: no current partials; {DATA_FILE} left unchanged")
+            return
+        # Partials found on disk only speak for their own carriers
+        scope = scope or list(partials)
+    write_data(merge_partials(partials, previous, scope=scope))
+
+def saved_page_urls(carrier, phase, paths, urls=None):
+    # Saved HTML doesn't record its URL; pages without a fixed spec URL need one each
+    spec = OFFLINE_PHASES[(carrier, phase)][0]
+    urls = urls or []
+    if spec.url and not urls:
+        return [spec.url] * len(paths)
+    if len(urls) != len(paths):
+        raise ValueError(f"{carrier}/{phase} needs one --url per saved page "
+                         f"({len(paths)} page(s), {len(urls)} --url)")
+    return urls
+
+def parse_saved(carrier, phase, paths, urls, persist=True):
+    spec, parse, _ = OFFLINE_PHASES[(carrier, phase)]
+    result = None
+    for path, url in zip(paths, urls):
+        with open(path, "r", encoding="utf-8") as f:
+            page_data = extract_html(f.read(), spec)
+        page_result = parse(page_data, url, persist)
+        if result is None:
+            result = page_result
+        elif isinstance(result, dict):
+            result.update(page_result)
+        else:
+            result.extend(i for i in page_result if i not in result)
+    print(f"Parsed {len(paths)} saved page(s) for {carrier}/{phase}")
+    return result
+
+async def run_parse(carrier, phase, paths, urls=None, write=False):
+    """Re-run one phase's extraction on saved HTML, without a browser.
+
+    By default the phase data is only printed. With write, it is
+    checkpointed like a scraped phase, the carrier's items are rebuilt from
+    its checkpoints and merged into data.json.
+    """
+    if (carrier, phase) not in OFFLINE_PHASES:
+        raise ValueError(f"{carrier}/{phase} can't run on saved HTML "
+                         f"(supported: {', '.join(c + '/' + p for c, p in OFFLINE_PHASES)})")
+    urls = saved_page_urls(carrier, phase, paths, urls)
+    # Parsed up front: an unreadable file shouldn't mark the checkpoint failed
+    result = parse_saved(carrier, phase, paths, urls, persist=write)
+    if not write:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        print("Dry run: pass --write to checkpoint this and update " + DATA_FILE)
+        return
+    if OFFLINE_PHASES[(carrier, phase)][2]:
+        previous = load_checkpoints(carrier).get(phase, {}).get("data")
+        if previous is None:
+            # Never checkpointed: start from what data.json currently shows for the carrier
+            previous = [i for i in load_previous_data().get("items", []) if i.get("carrier") == CARRIER_NAMES[carrier]]
+        kept = [i for i in previous if i.get("url") not in urls]
+        print(f"Checkpoint: {carrier}/{phase} keeps {len(kept)} items from other pages")
+        result = kept + result
+    async def saved():
+        return result
+    await run_phase(carrier, phase, saved, None)
+    # Nothing selected: every phase is served from its checkpoint, so no page is needed
+    items = await SCRAPERS[carrier](None, phases=set())
+    if not items:
+        # e.g. only stock was ever parsed offline; the fee checkpoint is still missing
+        print(f"No {carrier} items could be rebuilt from checkpoints; {DATA_FILE} left unchanged")
+        return
+    partials = {carrier: {"carrier": carrier, "items": items, "stale_phases": stale_phases([carrier])}}
+    write_data(merge_partials(partials, load_previous_data(), scope=[carrier]))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Same CLI as python -m iphone_monitor
+    import iphone_monitor
+    iphone_monitor.main()
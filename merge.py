@@ -0,0 +1,157 @@
+
+import glob
+import json
+import os
+from datetime import datetime, timedelta
+
+from cache import cache_path
+
+# Shard key -> "carrier" value used in data.json; also the merge order
+CARRIER_NAMES = {
+    "rakuten": "Rakuten",
+    "ahamo": "ahamo",
+    "uq": "UQ mobile",
+}
+
+PARTIAL_DIR = cache_path("partials")
+
+STAMP_FORMAT = "%Y-%m-%d %H:%M"
+
+# Partials older than this are leftovers of an earlier run, not results
+PARTIAL_MAX_AGE = timedelta(hours=12)
+
+REQUIRED_FIELDS = {
+    "carrier": str,
+    "model": str,
+    "storage": str,
+    "price_gross": int,
+    "price_effective_rent": int,
+    "price_effective_buyout": int,
+    "url": str,
+}
+
+
+def partial_path(carrier):
+    return os.path.join(PARTIAL_DIR, f"{carrier}.json")
+
+
+def write_partial(path, carrier, items, stale_phases):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    partial = {
+        "carrier": carrier,
+        "updated_at": datetime.now().strftime(STAMP_FORMAT),
+        "items": items,
+        "stale_phases": stale_phases,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(partial, f, indent=2, ensure_ascii=False)
+
+
+def validate_item(item, carrier):
+    for field, kind in REQUIRED_FIELDS.items():
+        if not isinstance(item.get(field), kind):
+            return f"bad {field}: {item.get(field)!r}"
+    if item["carrier"] != CARRIER_NAMES[carrier]:
+        return f"carrier {item['carrier']!r} in {carrier} shard"
+    if item["price_gross"] <= 0:
+        return f"price_gross {item['price_gross']}"
+    return None
+
+
+def load_partials(paths=None):
+    if paths is None:
+        paths = sorted(glob.glob(os.path.join(PARTIAL_DIR, "*.json")))
+    partials = {}
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                partial = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Merge: skipping unreadable partial {path}: {e}")
+            continue
+        carrier = partial.get("carrier")
+        if carrier not in CARRIER_NAMES or not isinstance(partial.get("items"), list):
+            print(f"Merge: skipping malformed partial {path}")
+            continue
+        partials[carrier] = partial
+    return partials
+
+
+def parse_stamp(value):
+    try:
+        return datetime.strptime(value, STAMP_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def current_partials(partials, previous=None, max_age=PARTIAL_MAX_AGE):
+    """Drop partials that predate `previous` (the current data.json) or `max_age`.
+
+    Merging one of those would put an old run's prices back over newer ones.
+    """
+    newest = parse_stamp((previous or {}).get("updated_at"))
+    kept = {}
+    for carrier, partial in partials.items():
+        stamp = parse_stamp(partial.get("updated_at"))
+        if stamp is None:
+            print(f"Merge: skipping {carrier} partial without a valid updated_at")
+        elif datetime.now() - stamp > max_age:
+            print(f"Merge: skipping {carrier} partial from {partial['updated_at']} (older than {max_age})")
+        elif newest and stamp < newest:
+            print(f"Merge: skipping {carrier} partial from {partial['updated_at']} "
+                  f"(data.json is from {previous['updated_at']})")
+        else:
+            kept[carrier] = partial
+    return kept
+
+
+def merge_partials(partials, previous=None, scope=None):
+    """Combine per-carrier partial results into one data.json snapshot.
+
+    Carriers are merged in CARRIER_NAMES order and duplicates keep the first
+    offer, so the output doesn't depend on which worker finished first.
+    A carrier with no usable partial, or an empty one after failed phases,
+    keeps its items from `previous`, flagged stale. Carriers outside `scope` (default: all) weren't part of
+    this run and are carried over from `previous` unchanged.
+    """
+    previous_items = (previous or {}).get("items", [])
+    previous_stale = (previous or {}).get("stale_phases", [])
+    items = []
+    stale = []
+    seen = set()
+    for carrier, carrier_name in CARRIER_NAMES.items():
+        partial = partials.get(carrier)
+        if partial is not None and not partial["items"] and partial.get("stale_phases"):
+            # A failed phase with no checkpoint to fall back on yields nothing;
+            # that's an outage, not an empty catalog
+            carrier_items = [dict(i, stale=True) for i in previous_items if i.get("carrier") == carrier_name]
+            if carrier_items:
+                print(f"Merge: {carrier} partial is empty after failed phases, keeping {len(carrier_items)} previous items as stale")
+            stale.extend(partial["stale_phases"])
+        elif partial is not None:
+            carrier_items = partial["items"]
+            stale.extend(partial.get("stale_phases", []))
+        elif scope is not None and carrier not in scope:
+            carrier_items = [i for i in previous_items if i.get("carrier") == carrier_name]
+            stale.extend(s for s in previous_stale if s.get("carrier") == carrier)
+        else:
+            carrier_items = [dict(i, stale=True) for i in previous_items if i.get("carrier") == carrier_name]
+            if carrier_items:
+                print(f"Merge: no partial for {carrier}, keeping {len(carrier_items)} previous items as stale")
+            stale.append({"carrier": carrier, "phase": "all", "status": "missing", "updated_at": (previous or {}).get("updated_at")})
+
+        for item in carrier_items:
+            problem = validate_item(item, carrier)
+            if problem:
+                print(f"Merge: dropping {carrier} item {item.get('model')} {item.get('storage')}: {problem}")
+                continue
+            key = (item["carrier"], item["model"], item["storage"])
+            if key in seen: continue
+            seen.add(key)
+            items.append(item)
+
+    return {
+        "updated_at": datetime.now().strftime(STAMP_FORMAT),
+        "items": items,
+        "stale_phases": stale,
+    }
@@ -0,0 +1,210 @@
+
+import re
+from html.parser import HTMLParser
+
+from extract import Group, parse_fields
+
+# Runs the same PageSpecs as extract.extract_page() over saved HTML (e.g.
+# page.content() dumps), so selectors and parsers can be checked without a
+# browser. Only the CSS the specs use is supported: tag/.class/#id/[attr],
+# [attr='v'], [attr*='v'], descendant combinators and comma lists.
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+             "param", "source", "track", "wbr"}
+HIDDEN_TAGS = {"script", "style", "noscript", "template", "head"}
+BLOCK_TAGS = {"address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figure",
+              "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main",
+              "nav", "ol", "p", "pre", "section", "table", "tr", "ul"}
+
+
+class Node:
+    def __init__(self, tag, attrs=None, parent=None):
+        self.tag = tag
+        self.attrs = attrs or {}
+        self.parent = parent
+        self.children = []
+
+    def elements(self):
+        # Descendant elements in document order
+        for child in self.children:
+            if isinstance(child, Node):
+                yield child
+                yield from child.elements()
+
+    def text_content(self):
+        return "".join(c if isinstance(c, str) else c.text_content() for c in self.children)
+
+    def inner_text(self):
+        # Rough innerText: hidden elements dropped, one line per block, whitespace collapsed
+        lines = (" ".join(line.split()) for line in self._rendered().split("\n"))
+        return "\n".join(line for line in lines if line)
+
+    def _rendered(self):
+        parts = []
+        for child in self.children:
+            if isinstance(child, str):
+                parts.append(child.replace("\n", " "))
+            elif child.tag not in HIDDEN_TAGS:
+                text = child._rendered()
+                if child.tag in BLOCK_TAGS: text = "\n" + text + "\n"
+                elif child.tag in ("td", "th"): text += " "
+                parts.append(text)
+        return "".join(parts)
+
+
+class TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document")
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {k: v or "" for k, v in attrs}, self.stack[-1])
+        self.stack[-1].children.append(node)
+        if tag not in VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.stack[-1].children.append(Node(tag, {k: v or "" for k, v in attrs}, self.stack[-1]))
+
+    def handle_endtag(self, tag):
+        # Tolerate stray or unclosed tags: close up to the nearest open match
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        self.stack[-1].children.append(data)
+
+
+def parse_html(html):
+    builder = TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+_SIMPLE = re.compile(r"""\.([\w-]+)|\#([\w-]+)|\[([\w-]+)(?:([*^$]?=)\s*['"]?([^'"\]]*)['"]?)?\]""")
+
+
+def parse_compound(text):
+    m = re.match(r'[a-zA-Z][\w-]*|\*', text)
+    tag = m.group(0).lower() if m else None
+    rest = text[m.end():] if m else text
+    conditions = []
+    pos = 0
+    for s in _SIMPLE.finditer(rest):
+        if s.start() != pos:
+            raise ValueError(f"Unsupported selector: {text}")
+        pos = s.end()
+        conditions.append(s.groups())
+    if pos != len(rest):
+        raise ValueError(f"Unsupported selector: {text}")
+    return tag, conditions
+
+
+def parse_selector(selector):
+    groups = []
+    for part in selector.split(","):
+        if re.search(r'[>+~:]', part):
+            raise ValueError(f"Unsupported selector: {selector}")
+        groups.append([parse_compound(c) for c in part.split()])
+    return groups
+
+
+def match_compound(node, compound):
+    tag, conditions = compound
+    if tag and tag != "*" and node.tag != tag: return False
+    for cls, id_, attr, op, value in conditions:
+        if cls and cls not in node.attrs.get("class", "").split(): return False
+        if id_ and node.attrs.get("id") != id_: return False
+        if attr:
+            if attr not in node.attrs: return False
+            actual = node.attrs[attr]
+            if op == "=" and actual != value: return False
+            if op == "*=" and value not in actual: return False
+            if op == "^=" and not actual.startswith(value): return False
+            if op == "$=" and not actual.endswith(value): return False
+    return True
+
+
+def match_chain(node, chain):
+    if not match_compound(node, chain[-1]): return False
+    ancestor = node.parent
+    for compound in reversed(chain[:-1]):
+        while ancestor is not None and not (ancestor.tag != "#document" and match_compound(ancestor, compound)):
+            ancestor = ancestor.parent
+        if ancestor is None: return False
+        ancestor = ancestor.parent
+    return True
+
+
+def matches(node, selector):
+    return any(match_chain(node, chain) for chain in parse_selector(selector))
+
+
+def select(scope, selector):
+    # Like querySelectorAll: ancestors above `scope` still count for descendant combinators
+    groups = parse_selector(selector)
+    return [n for n in scope.elements() if any(match_chain(n, chain) for chain in groups)]
+
+
+def read(node, attr):
+    if attr == "text": return node.text_content()
+    if attr == "inner_text": return node.inner_text()
+    return node.attrs.get(attr)
+
+
+def read_field(root, scope, f):
+    for sel in [f.selector] + f.fallbacks:
+        els = [root] if sel == "" else select(scope, sel)
+        if not els: continue
+        if f.attr == "visible_text":
+            outer = [n for n in els if not any(o is not n and is_ancestor(o, n) for o in els)]
+            return "\n".join(n.inner_text() for n in outer)
+        if f.all: return [read(el, f.attr) or "" for el in els]
+        for el in els:
+            v = read(el, f.attr)
+            if v and v.strip() and (not f.contains or f.contains in v): return v
+    return [] if f.all else None
+
+
+def is_ancestor(a, b):
+    node = b.parent
+    while node is not None:
+        if node is a: return True
+        node = node.parent
+    return False
+
+
+def read_group(scope, g):
+    els = []
+    for sel in [g.selector] + g.fallbacks:
+        els = select(scope, sel)
+        if els: break
+    out = []
+    for el in els:
+        inner = el
+        if g.sibling:
+            siblings = [c for c in el.parent.children if isinstance(c, Node)]
+            following = siblings[siblings.index(el) + 1:]
+            inner = next((s for s in following if matches(s, g.sibling)), None)
+            if inner is None: continue
+        item = read_fields(el, inner, g.fields)
+        if g.fingerprint:
+            item["_text"] = el.text_content() if inner is el else el.text_content() + "\n" + inner.text_content()
+        out.append(item)
+    return out
+
+
+def read_fields(root, scope, defs):
+    return {name: read_group(scope, d) if isinstance(d, Group) else read_field(root, scope, d)
+            for name, d in defs.items()}
+
+
+def extract_html(html, spec):
+    """extract_page() for a saved HTML document: same spec, same result shape."""
+    document = parse_html(html)
+    root = next(document.elements(), document)
+    return parse_fields(spec.fields, read_fields(root, document, spec.fields))
@@ -0,0 +1,157 @@
+
+import html
+import json
+import re
+
+DATA_FILE = "docs/data.json"
+WIDGET_FILE = "docs/widget.html"
+BASE_URL = "./"
+
+# Must match INITIAL_DISPLAY_COUNT in docs/js/app.js
+INITIAL_DISPLAY_COUNT = 5
+
+CSS_START, CSS_END = "<!-- prerender:css:start -->", "<!-- prerender:css:end -->"
+LIST_START, LIST_END = "<!-- prerender:list:start -->", "<!-- prerender:list:end -->"
+
+# Just the Tailwind utilities the prerendered cards use, so they paint correctly
+# before the Tailwind CDN script has run. Hover/transition classes are left to Tailwind.
+CRITICAL_CSS = """
+#monitor-app *,#monitor-app *::before,#monitor-app *::after{box-sizing:border-box;border:0 solid #e5e7eb}
+#monitor-app{font-family:ui-sans-serif,system-ui,-apple-system,"Hiragino Sans",sans-serif;line-height:1.5}
+#monitor-app h3{margin:0;font-size:inherit;font-weight:inherit}
+#monitor-app img,#monitor-app svg{display:block;max-width:100%}
+#monitor-app a{color:inherit;text-decoration:inherit}
+.grid{display:grid}.grid-cols-1{grid-template-columns:repeat(1,minmax(0,1fr))}
+.block{display:block}.flex{display:flex}.flex-col{flex-direction:column}.flex-wrap{flex-wrap:wrap}
+.flex-grow{flex-grow:1}.flex-shrink-0{flex-shrink:0}.min-w-0{min-width:0}
+.items-start{align-items:flex-start}.items-center{align-items:center}.items-baseline{align-items:baseline}
+.justify-center{justify-content:center}
+.gap-1{gap:.25rem}.gap-2{gap:.5rem}.gap-3{gap:.75rem}.gap-4{gap:1rem}.gap-6{gap:1.5rem}
+.relative{position:relative}.absolute{position:absolute}.top-2{top:.5rem}.left-2{left:.5rem}.z-10{z-index:10}
+.overflow-hidden{overflow:hidden}
+.w-full{width:100%}.h-full{height:100%}.w-20{width:5rem}.h-24{height:6rem}.h-5{height:1.25rem}.w-4{width:1rem}.h-4{height:1rem}
+.p-2{padding:.5rem}.p-5{padding:1.25rem}.px-1\\.5{padding-left:.375rem;padding-right:.375rem}.px-2{padding-left:.5rem;padding-right:.5rem}
+.py-0\\.5{padding-top:.125rem;padding-bottom:.125rem}.py-3{padding-top:.75rem;padding-bottom:.75rem}
+.mt-1{margin-top:.25rem}.mt-3{margin-top:.75rem}.mb-2{margin-bottom:.5rem}
+.border{border-width:1px}.border-gray-100{border-color:#f3f4f6}
+.rounded{border-radius:.25rem}.rounded-xl{border-radius:.75rem}.rounded-2xl{border-radius:1rem}
+.bg-white{background-color:#fff}.bg-gray-50{background-color:#f9fafb}.bg-gray-100{background-color:#f3f4f6}
+.bg-slate-900{background-color:#0f172a}.bg-yellow-400{background-color:#facc15}
+.shadow-sm{box-shadow:0 1px 2px 0 rgb(0 0 0/.05)}.shadow-lg{box-shadow:0 10px 15px -3px rgb(0 0 0/.1)}
+.object-contain{object-fit:contain}.object-left{object-position:left}.opacity-80{opacity:.8}
+.text-center{text-align:center}.text-\\[10px\\]{font-size:10px}.text-xs{font-size:.75rem;line-height:1rem}
+.text-sm{font-size:.875rem;line-height:1.25rem}.text-lg{font-size:1.125rem;line-height:1.75rem}
+.text-3xl{font-size:1.875rem;line-height:2.25rem}
+.font-medium{font-weight:500}.font-bold{font-weight:700}.font-black{font-weight:900}
+.leading-tight{line-height:1.25}.tracking-tighter{letter-spacing:-.05em}
+.text-white{color:#fff}.text-gray-400{color:#9ca3af}.text-gray-500{color:#6b7280}.text-gray-900{color:#111827}
+.text-slate-800{color:#1e293b}.text-yellow-900{color:#713f12}.text-red-600{color:#dc2626}
+.bg-red-50{background-color:#fef2f2}.border-red-100{border-color:#fee2e2}
+"""
+
+
+def carrier_logo(carrier):
+    if carrier == "Rakuten": return BASE_URL + "images/logo_rakuten.png"
+    if carrier == "ahamo": return BASE_URL + "images/logo_ahamo.png"
+    if carrier == "UQ mobile": return BASE_URL + "images/logo_uq.png"
+    return ""
+
+
+def carrier_display_name(carrier):
+    if carrier == "Rakuten": return "楽天モバイル"
+    return carrier
+
+
+def product_image(model):
+    # Mirrors getProductImage in app.js
+    clean = model.lower()
+    if "se" in clean and ("3" in clean or "第3" in clean):
+        clean = "iphonese3"
+    else:
+        clean = re.sub(r'[^a-z0-9]', '', clean)
+    return BASE_URL + "images/" + clean + ".png"
+
+
+def default_view(items):
+    """Cards app.js shows first: every carrier, rent mode, price ascending."""
+    # markLowestPrices: cheapest rent per model/storage across carriers
+    lowest = {}
+    for item in items:
+        key = (item["model"], item["storage"])
+        lowest[key] = min(lowest.get(key, item["price_effective_rent"]), item["price_effective_rent"])
+    ranked = sorted(items, key=lambda i: i["price_effective_rent"])
+    return [(item, item["price_effective_rent"] == lowest[(item["model"], item["storage"])])
+            for item in ranked[:INITIAL_DISPLAY_COUNT]]
+
+
+def render_card(item, is_lowest):
+    e = html.escape
+    unit_badge = "返却P" if item.get("program_exemption", 0) > 0 else ""
+    lowest_badge = ('<div class="absolute top-2 left-2 bg-yellow-400 text-yellow-900 text-[10px] font-black px-2 py-0.5 rounded shadow-sm z-10">最安</div>'
+                    if is_lowest else "")
+    badge_html = (f'<div class="mt-1"><span class="text-[10px] text-red-600 bg-red-50 border border-red-100 px-1.5 py-0.5 rounded font-bold">{unit_badge}</span></div>'
+                  if unit_badge else "")
+    return f"""
+                <div class="flex flex-col gap-3 p-5 border border-gray-100 rounded-2xl bg-white shadow-sm hover:shadow-xl hover:-translate-y-1 hover:border-blue-200 transition-all duration-300 relative overflow-hidden group">
+                    {lowest_badge}
+                    <div class="flex gap-4 items-start">
+                        <div class="w-20 h-24 flex-shrink-0 bg-gray-50 rounded-xl flex items-center justify-center p-2 group-hover:bg-blue-50/50 transition-colors">
+                            <img src="{e(product_image(item['model']))}" onerror="this.onerror=null; this.src='https://placehold.co/200x250/e2e8f0/64748b?text=No+Image'; this.classList.add('opacity-50');" class="w-full h-full object-contain mix-blend-multiply transition-transform duration-500 group-hover:scale-110">
+                        </div>
+                        <div class="flex-grow min-w-0">
+                            <div class="flex flex-col gap-1 items-start mb-2">
+                                <div>
+                                    <h3 class="text-lg font-bold text-gray-900 leading-tight">{e(item['model'])}</h3>
+                                    <div class="flex flex-wrap gap-1 mt-1">
+                                            <span class="text-[10px] font-medium text-gray-500 bg-gray-100 px-1.5 py-0.5 rounded">{e(item['storage'])}</span>
+                                    </div>
+                                </div>
+                                <img src="{e(carrier_logo(item['carrier']))}" alt="{e(carrier_display_name(item['carrier']))}" class="h-5 object-contain object-left mt-1 opacity-80 group-hover:opacity-100 transition-opacity">
+                            </div>
+                            <div class="mt-3">
+                                <div class="flex items-baseline gap-1">
+                                    <span class="text-xs text-gray-400 font-bold">実質負担</span>
+                                    <span class="text-3xl font-black text-slate-800 tracking-tighter font-sans">¥{item['price_effective_rent']:,}</span>
+                                </div>
+                                {badge_html}
+                            </div>
+                        </div>
+                    </div>
+                    <a href="{e(item['url'])}" target="_blank" class="block w-full bg-slate-900 text-white text-center text-sm font-bold py-3 rounded-xl shadow-lg shadow-slate-200 hover:bg-slate-800 hover:shadow-xl transition active:scale-95 flex items-center justify-center gap-2 group/btn">
+                        公式サイトで見る
+                        <svg class="w-4 h-4 transition-transform group-hover/btn:translate-x-1" fill="none" stroke="currentColor" viewBox="0 0 24 24"><path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M14 5l7 7m0 0l-7 7m7-7H3"/></svg>
+                    </a>
+                </div>"""
+
+
+def render_list(data):
+    cards = "".join(render_card(item, is_lowest) for item, is_lowest in default_view(data.get("items", [])))
+    updated_at = html.escape(data.get("updated_at") or "")
+    return (f'<div id="mobile-list" class="grid grid-cols-1 gap-6" data-prerendered '
+            f'data-updated-at="{updated_at}">{cards}\n        </div>')
+
+
+def replace_between(page, start, end, content):
+    head, rest = page.split(start, 1)
+    _, tail = rest.split(end, 1)
+    return f"{head}{start}\n{content}\n        {end}{tail}"
+
+
+def prerender_widget(data, widget_file=WIDGET_FILE):
+    if not data.get("items"):
+        return
+    with open(widget_file, "r", encoding="utf-8") as f:
+        page = f.read()
+    if CSS_START not in page or LIST_START not in page:
+        print(f"Prerender: markers missing in {widget_file}, skipped")
+        return
+    page = replace_between(page, CSS_START, CSS_END, f'        <style id="critical-css">{CRITICAL_CSS}        </style>')
+    page = replace_between(page, LIST_START, LIST_END, "        " + render_list(data))
+    with open(widget_file, "w", encoding="utf-8") as f:
+        f.write(page)
+    print(f"Prerendered {min(len(data['items']), INITIAL_DISPLAY_COUNT)} cards into {widget_file}")
+
+
+if __name__ == "__main__":
+    with open(DATA_FILE, "r", encoding="utf-8") as f:
+        prerender_widget(json.load(f))
@@ -0,0 +1,135 @@
+
+import asyncio
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from datetime import datetime
+
+PROFILE_DIR = "profiles"
+TOP_N = 15
+
+
+class RunProfiler:
+    """Collects one profile bundle per run: a cProfile dump per phase,
+    optional Playwright traces per carrier, and asyncio task timings."""
+
+    def __init__(self, name, trace=False):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.out_dir = os.path.join(PROFILE_DIR, f"{stamp}_{name}")
+        self.trace = trace
+        self.phases = []
+        self.tasks = {}
+        os.makedirs(self.out_dir, exist_ok=True)
+
+    @contextlib.asynccontextmanager
+    async def phase(self, carrier, phase):
+        prof = cProfile.Profile()
+        started = time.perf_counter()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            path = os.path.join(self.out_dir, f"{carrier}_{phase}.prof")
+            prof.dump_stats(path)
+            self.phases.append({"carrier": carrier, "phase": phase,
+                                "seconds": round(time.perf_counter() - started, 3), "stats": path})
+
+    def install_task_timer(self, loop):
+        # Times every task from creation to completion, grouped by coroutine name
+        def factory(loop, coro, **kwargs):
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+            name = getattr(coro, "__qualname__", type(coro).__name__)
+            started = time.perf_counter()
+            task.add_done_callback(lambda t: self._record_task(name, time.perf_counter() - started))
+            return task
+        loop.set_task_factory(factory)
+
+    def _record_task(self, name, seconds):
+        entry = self.tasks.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        entry["count"] += 1
+        entry["total"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+
+    async def start_trace(self, context):
+        if self.trace:
+            await context.tracing.start(screenshots=True, snapshots=True, sources=False)
+
+    async def stop_trace(self, context, carrier):
+        if self.trace:
+            await context.tracing.stop(path=os.path.join(self.out_dir, f"{carrier}.trace.zip"))
+
+    def hot_spots(self):
+        files = [p["stats"] for p in self.phases]
+        if not files: return []
+        stats = pstats.Stats(*files, stream=io.StringIO())
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+            rows.append({"function": f"{os.path.basename(filename)}:{line}({func})",
+                         "calls": nc, "tottime": round(tt, 4), "cumtime": round(ct, 4)})
+        rows.sort(key=lambda r: r["tottime"], reverse=True)
+        return rows[:TOP_N]
+
+    def write_summary(self, extra=None):
+        hot = self.hot_spots()
+        tasks = sorted(({"task": k, **{f: round(v, 3) if isinstance(v, float) else v for f, v in e.items()}}
+                        for k, e in self.tasks.items()), key=lambda t: t["total"], reverse=True)[:TOP_N]
+        summary = {"phases": self.phases, "hot_spots": hot, "tasks": tasks}
+        summary.update(extra or {})
+        with open(os.path.join(self.out_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+        lines = ["Phase timings:"]
+        for p in sorted(self.phases, key=lambda p: p["seconds"], reverse=True):
+            lines.append(f"  {p['seconds']:8.2f}s  {p['carrier']}/{p['phase']}")
+        lines.append(f"Top {len(hot)} hot spots (tottime / cumtime / calls):")
+        for r in hot:
+            lines.append(f"  {r['tottime']:8.3f}s {r['cumtime']:8.3f}s {r['calls']:8d}  {r['function']}")
+        lines.append("Slowest asyncio tasks (total / max / count):")
+        for t in tasks[:5]:
+            lines.append(f"  {t['total']:8.2f}s {t['max']:8.2f}s {t['count']:8d}  {t['task']}")
+        table = "\n".join(lines)
+        with open(os.path.join(self.out_dir, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write(table + "\n")
+        print(table)
+        print(f"Profile bundle written to {self.out_dir}")
+
+
+# Set by start_profiling(); phases run unprofiled while this is None
+profiler = None
+
+
+def start_profiling(name, trace=False):
+    global profiler
+    profiler = RunProfiler(name, trace=trace)
+    profiler.install_task_timer(asyncio.get_running_loop())
+    return profiler
+
+
+def stop_profiling(extra=None):
+    global profiler
+    if profiler is None: return
+    asyncio.get_running_loop().set_task_factory(None)
+    profiler.write_summary(extra)
+    profiler = None
+
+
+async def start_trace(context):
+    if profiler is not None: await profiler.start_trace(context)
+
+
+async def stop_trace(context, carrier):
+    if profiler is not None: await profiler.stop_trace(context, carrier)
+
+
+@contextlib.asynccontextmanager
+async def profile_phase(carrier, phase):
+    if profiler is None:
+        yield
+        return
+    async with profiler.phase(carrier, phase):
+        yield
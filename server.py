@@ -0,0 +1,230 @@
+
+import argparse
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from urllib.parse import parse_qs, unquote, urlparse
+
+DATA_FILE = "docs/data.json"
+STATIC_DIR = "docs"
+POLL_INTERVAL = 5.0  # seconds between data.json mtime checks
+HEARTBEAT_INTERVAL = 15.0
+
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def item_key(item):
+    return f"{item.get('carrier')}|{item.get('model')}|{item.get('storage')}"
+
+
+def model_number(model):
+    # Same ordering as app.js: SE last, otherwise by generation
+    if "SE" in model: return -1
+    m = re.search(r'iPhone\s*(\d+)', model)
+    return int(m.group(1)) if m else 0
+
+
+def display_price(item, mode):
+    return item.get("price_effective_rent", 0) if mode == "rent" else item.get("price_gross", 0)
+
+
+def query_items(items, params):
+    carriers = [c for v in params.get("carrier", []) for c in v.split(",") if c]
+    model = params.get("model", ["All"])[0]
+    storage = params.get("storage", ["All"])[0]
+    mode = params.get("mode", ["rent"])[0]
+    sort = params.get("sort", ["price_asc"])[0]
+
+    result = [i for i in items
+              if (not carriers or i.get("carrier") in carriers)
+              and (model == "All" or i.get("model") == model)
+              and (storage == "All" or i.get("storage") == storage)]
+
+    if sort == "model_newest":
+        result.sort(key=lambda i: i.get("model", ""))
+        result.sort(key=lambda i: model_number(i.get("model", "")), reverse=True)
+    else:
+        result.sort(key=lambda i: display_price(i, mode), reverse=(sort == "price_desc"))
+    return result
+
+
+def diff_snapshots(old_items, new_items):
+    old = {item_key(i): i for i in old_items}
+    new = {item_key(i): i for i in new_items}
+    return {
+        "added": [i for k, i in new.items() if k not in old],
+        "changed": [i for k, i in new.items() if k in old and old[k] != i],
+        "removed": [k for k in old if k not in new],
+    }
+
+
+class SnapshotStore:
+    """Latest data.json held in memory, with SSE subscribers for deltas."""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.snapshot = {"updated_at": None, "items": []}
+        self.version = ""
+        self.subscribers = set()
+
+    def reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None
+        if mtime == self.mtime: return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                body = f.read()
+            snapshot = json.loads(body)
+        except (OSError, json.JSONDecodeError) as e:
+            # Scraper may be mid-write; try again on the next poll
+            print(f"Server: could not load {self.path}: {e}")
+            return None
+        self.mtime = mtime
+        version = hashlib.sha1(body.encode("utf-8")).hexdigest()[:16]
+        if version == self.version: return None
+
+        delta = diff_snapshots(self.snapshot.get("items", []), snapshot.get("items", []))
+        delta["updated_at"] = snapshot.get("updated_at")
+        delta["version"] = version
+        self.snapshot = snapshot
+        self.version = version
+        print(f"Server: loaded snapshot {version} ({len(snapshot.get('items', []))} items)")
+        return delta
+
+    def publish(self, delta):
+        for queue in list(self.subscribers):
+            queue.put_nowait(delta)
+
+    async def watch(self):
+        while True:
+            delta = self.reload()
+            if delta and (delta["added"] or delta["changed"] or delta["removed"]):
+                self.publish(delta)
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+async def read_request(reader):
+    request_line = await reader.readline()
+    if not request_line: return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) < 2: return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""): break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return parts[0], parts[1], headers
+
+
+async def send_response(writer, status, body=b"", content_type="application/json; charset=utf-8", extra_headers=None):
+    headers = {
+        "Content-Type": content_type,
+        "Content-Length": str(len(body)),
+        "Access-Control-Allow-Origin": "*",
+        "Connection": "close",
+    }
+    headers.update(extra_headers or {})
+    head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+    head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def send_json(writer, headers, payload, etag_seed):
+    # ETag covers snapshot version + query, so unchanged filters answer 304
+    etag = '"' + hashlib.sha1(etag_seed.encode("utf-8")).hexdigest()[:20] + '"'
+    if headers.get("if-none-match") == etag:
+        await send_response(writer, 304, extra_headers={"ETag": etag})
+        return
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send_response(writer, 200, body, extra_headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+async def stream_events(writer, store):
+    queue = asyncio.Queue()
+    store.subscribers.add(queue)
+    try:
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            "Connection: keep-alive\r\n\r\n"
+            f"event: hello\ndata: {json.dumps({'version': store.version})}\n\n"
+        ).encode("utf-8"))
+        await writer.drain()
+        while True:
+            try:
+                delta = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                message = f"id: {delta['version']}\nevent: delta\ndata: {json.dumps(delta, ensure_ascii=False)}\n\n"
+            except asyncio.TimeoutError:
+                message = ": keep-alive\n\n"
+            writer.write(message.encode("utf-8"))
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        store.subscribers.discard(queue)
+
+
+async def send_static(writer, path):
+    rel = os.path.normpath(unquote(path).lstrip("/") or "index.html")
+    full = os.path.join(STATIC_DIR, rel)
+    if rel.startswith("..") or not os.path.isfile(full):
+        await send_response(writer, 404, b'{"error": "not found"}')
+        return
+    with open(full, "rb") as f:
+        body = f.read()
+    await send_response(writer, 200, body, mimetypes.guess_type(full)[0] or "application/octet-stream")
+
+
+async def handle(reader, writer, store):
+    try:
+        request = await read_request(reader)
+        if request is None: return
+        method, target, headers = request
+        url = urlparse(target)
+        if method != "GET":
+            await send_response(writer, 405, b'{"error": "GET only"}')
+            return
+
+        if url.path == "/api/items":
+            params = parse_qs(url.query)
+            items = query_items(store.snapshot.get("items", []), params)
+            payload = {"updated_at": store.snapshot.get("updated_at"), "version": store.version, "items": items}
+            await send_json(writer, headers, payload, store.version + "?" + url.query)
+        elif url.path in ("/data.json", "/api/snapshot"):
+            await send_json(writer, headers, store.snapshot, store.version)
+        elif url.path == "/api/events":
+            await stream_events(writer, store)
+        else:
+            await send_static(writer, url.path)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, data_file):
+    store = SnapshotStore(data_file)
+    store.reload()
+    server = await asyncio.start_server(lambda r, w: handle(r, w, store), host, port)
+    print(f"Serving {data_file} on http://{host}:{port}/ (api: /api/items, /api/events)")
+    async with server:
+        await asyncio.gather(server.serve_forever(), store.watch())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve data.json with filtered queries and live SSE deltas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--data", default=DATA_FILE, help="snapshot written by main.py")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.data))
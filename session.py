@@ -0,0 +1,87 @@
+
+import os
+import shutil
+import time
+
+from cache import cache_path
+
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "locale": "ja-JP",
+}
+
+# --session modes:
+#   "none"    fresh context every run (default)
+#   "state"   reuse cookies/localStorage (consent banners, redirects) via storage_state
+#   "profile" persistent Chromium profile: storage plus the HTTP disk cache for site bundles
+SESSION_MODES = ["none", "state", "profile"]
+
+PROFILE_MAX_BYTES = 300 * 1024 * 1024
+PROFILE_MAX_AGE = 7 * 24 * 60 * 60
+CREATED_MARKER = ".created_at"
+
+
+def storage_state_file(name):
+    return cache_path(f"storage_state_{name}.json")
+
+
+def profile_dir(name):
+    # One directory per shard: Chromium locks its user data dir
+    return cache_path(f"browser-profile_{name}")
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+def prune_profile(path):
+    # Start over when the profile is too old or too big; a cold run rebuilds it
+    if not os.path.isdir(path): return
+    try:
+        with open(os.path.join(path, CREATED_MARKER), "r") as f:
+            created_at = float(f.read().strip())
+    except (OSError, ValueError):
+        created_at = 0
+    size = dir_size(path)
+    if time.time() - created_at > PROFILE_MAX_AGE or size > PROFILE_MAX_BYTES:
+        print(f"Session: discarding browser profile {path} ({size // (1024 * 1024)} MB)")
+        shutil.rmtree(path, ignore_errors=True)
+
+
+async def open_context(p, session="none", name="default"):
+    if session == "profile":
+        path = profile_dir(name)
+        prune_profile(path)
+        fresh = not os.path.isdir(path)
+        context = await p.chromium.launch_persistent_context(
+            path, headless=True, args=[f"--disk-cache-size={PROFILE_MAX_BYTES // 2}"], **CONTEXT_OPTIONS)
+        if fresh:
+            with open(os.path.join(path, CREATED_MARKER), "w") as f:
+                f.write(str(time.time()))
+        print(f"Session: {'cold' if fresh else 'warm'} browser profile {path}")
+        return context
+
+    # Launch browser (headless=False for debug if needed, but usually True)
+    browser = await p.chromium.launch(headless=True)
+    options = dict(CONTEXT_OPTIONS)
+    state_file = storage_state_file(name)
+    if session == "state" and os.path.exists(state_file) and time.time() - os.path.getmtime(state_file) < PROFILE_MAX_AGE:
+        options["storage_state"] = state_file
+        print(f"Session: reusing storage state {state_file}")
+    return await browser.new_context(**options)
+
+
+async def close_context(context, session="none", name="default"):
+    if session == "state":
+        os.makedirs(os.path.dirname(storage_state_file(name)), exist_ok=True)
+        await context.storage_state(path=storage_state_file(name))
+    browser = context.browser
+    await context.close()
+    if browser: await browser.close()
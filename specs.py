@@ -0,0 +1,129 @@
+
+from extract import DEFAULT_TEXT_ROOTS, Field, Group, PageSpec
+
+# Selectors, readiness and label keywords for every page the scraper reads.
+# main.py only turns the extracted values into offers.
+
+# Main content text, same roots as extract.iter_visible_text()
+VISIBLE_TEXT = Field(DEFAULT_TEXT_ROOTS[0], attr="visible_text", parser="raw",
+                     fallbacks=DEFAULT_TEXT_ROOTS[1:] + ["body"])
+
+# --- Rakuten ---
+
+RAKUTEN_CAMPAIGN_INDEX = PageSpec(
+    name="rakuten_campaign_index",
+    url="https://network.mobile.rakuten.co.jp/product/iphone/",
+    settle_ms=3000,
+    fields={
+        "links": Field("a[href*='campaign']", attr="href", parser="raw", all=True),
+    },
+)
+
+RAKUTEN_STOCK = PageSpec(
+    name="rakuten_stock",
+    url="https://network.mobile.rakuten.co.jp/product/iphone/stock/",
+    ready=".product-iphone-stock-Layout_Product-name",
+    settle_ms=3000,
+    fields={
+        "products": Group(".product-iphone-stock-Layout_Product-name",
+                          sibling=".product-iphone-stock-Layout_Product-area", fingerprint=True, fields={
+            "model": Field(""),
+            "colors": Group(".color-details", fields={
+                "color": Field(".c-Heading_Lv4, h4"),
+                "rows": Group("table tbody tr", fields={
+                    "cells": Field("td", all=True, parser="raw"),
+                }),
+            }),
+        }),
+    },
+)
+
+RAKUTEN_FEE = PageSpec(
+    name="rakuten_fee",
+    url="https://network.mobile.rakuten.co.jp/product/iphone/fee/",
+    ready=".product-iphone-Fee_Media",
+    settle_ms=3000,
+    fields={
+        "sections": Group(".product-iphone-Fee_Media", fallbacks=["section"], fingerprint=True, fields={
+            "model": Field("h3, .product-name, h2"),
+            "headers": Field("table thead th", all=True),
+            "rows": Group("table tbody tr", fields={
+                "label": Field("th"),
+                "cells": Field("td", all=True, parser="raw"),
+            }),
+        }),
+    },
+    # Row header keywords, checked in this order
+    labels={
+        "gross": ["楽天モバイル", "一括価格", "現金販売価格"],
+        "program": ["買い替え超トクプログラム", "24回分"],
+        "rent": ["実質", "キャンペーン"],
+    },
+)
+
+# --- ahamo ---
+
+AHAMO_LISTING = PageSpec(
+    name="ahamo_listing",
+    url="https://ahamo.com/products/iphone/",
+    ready="a.a-product-thumbnail-link",
+    settle_ms=5000,
+    fields={
+        "cards": Group("a.a-product-thumbnail-link", fingerprint=True, fields={
+            "href": Field("", attr="href", parser="raw"),
+            "name": Field(".a-product-thumbnail__name", fallbacks=[".a-product-thumbnail-link__name"]),
+            # 定価; older cards only have the plain price number
+            "gross": Field(".a-product-thumbnail__price .a-price-amount", parser="price",
+                           fallbacks=[".a-product-thumbnail-link__price-number"]),
+            # 実質負担 in the kaedoki (買い替え) block
+            "rent": Field(".a-product-thumbnail-link__kaedoki-campaign-content-price-item-price .a-price-amount", parser="price"),
+            "discount": Field(".a-product-thumbnail-link__kaedoki-campaign-content-price-item-discount .a-price-amount", parser="price"),
+        }),
+    },
+)
+
+AHAMO_DETAIL = PageSpec(
+    name="ahamo_detail",
+    settle_ms=2000,
+    fields={
+        "text": VISIBLE_TEXT,
+        # Colour/stock block; when missing, the text after a "stock" label is used
+        "stock": Field("[class*='stock']", attr="visible_text", parser="raw",
+                       fallbacks=["[class*='Stock']", "[class*='zaiko']"]),
+        # Clickable choices; the capacity ones ("128GB") are selected one by one
+        # on pages that show a single price block for the selected capacity
+        "options": Field("button, label, [role='radio']", all=True),
+    },
+    labels={
+        "rent": ["お客さま負担", "実質負担", "負担額"],
+        "discount": ["割引"],
+        "stock": ["在庫状況", "在庫・お届け"],
+        # Words that sit next to a stock status but aren't colours
+        "not_color": ["在庫", "オンライン", "ショップ", "店舗", "お届け", "容量"],
+    },
+)
+
+# --- UQ mobile ---
+
+UQ_INDEX = PageSpec(
+    name="uq_index",
+    url="https://www.uqwimax.jp/mobile/iphone/",
+    settle_ms=3000,
+    fields={
+        "links": Field("a[href*='/mobile/iphone/']", attr="href", parser="raw", all=True),
+    },
+)
+
+UQ_MODEL = PageSpec(
+    name="uq_model",
+    settle_ms=2000,
+    fields={
+        "model": Field("h1", contains="iPhone", fallbacks=[".product-name", "title"]),
+        "title": Field("title"),
+        "text": VISIBLE_TEXT,
+    },
+    labels={
+        "gross": ["機種代金"],
+        "discount": ["最大割引額"],
+    },
+)
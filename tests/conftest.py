@@ -0,0 +1,6 @@
+
+import os
+import sys
+
+# The scraper modules live flat in the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
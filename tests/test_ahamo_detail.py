@@ -0,0 +1,37 @@
+
+import os
+
+from main import parse_ahamo_detail
+from offline import extract_html
+from specs import AHAMO_DETAIL
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return extract_html(f.read(), AHAMO_DETAIL)
+
+
+def test_selector_page_prices_are_not_filed_under_the_last_option():
+    detail = parse_ahamo_detail(load("ahamo_detail_selector.html"))
+    assert detail["tiers"] == {}
+    assert detail["options"] == ["128GB", "256GB", "512GB"]
+
+
+def test_selector_page_prices_go_to_the_selected_option():
+    detail = parse_ahamo_detail(load("ahamo_detail_selector.html"), selected="128GB")
+    assert list(detail["tiers"]) == ["128GB"]
+    tier = detail["tiers"]["128GB"]
+    assert (tier["price_gross"], tier["discount_official"], tier["price_effective_rent"]) == (124800, 22000, 47000)
+    assert [(v["color"], v["stock_available"]) for v in tier["variants"]] == [
+        ("ブラック", True), ("ホワイト", False), ("ピンク", True)]
+
+
+def test_per_tier_page():
+    detail = parse_ahamo_detail(load("ahamo_detail_tiers.html"))
+    assert {s: (t["price_gross"], t["price_effective_rent"]) for s, t in detail["tiers"].items()} == {
+        "128GB": (112200, 42000), "256GB": (131890, 55000)}
+    assert [v["color"] for v in detail["tiers"]["128GB"]["variants"]] == ["ブルー", "ブラック"]
+    assert [v["stock_text"] for v in detail["tiers"]["256GB"]["variants"]] == ["入荷待ち"]
+    assert detail["options"] == []
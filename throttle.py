@@ -0,0 +1,144 @@
+
+import asyncio
+import random
+import time
+from urllib.parse import urlparse
+
+# Requests per second, burst size and concurrent requests allowed per host.
+# Anything not listed here uses "default".
+HOST_LIMITS = {
+    "default": {"rate": 1.0, "burst": 3, "max_in_flight": 2},
+    "network.mobile.rakuten.co.jp": {"rate": 1.0, "burst": 3, "max_in_flight": 2},
+    "ahamo.com": {"rate": 0.5, "burst": 2, "max_in_flight": 2},
+    "www.uqwimax.jp": {"rate": 1.0, "burst": 3, "max_in_flight": 2},
+}
+
+JITTER = 0.5  # extra random spacing (seconds) after each token
+RETRY_STATUSES = (429, 503)
+MAX_RETRIES = 3
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostState:
+    def __init__(self, limits):
+        self.bucket = TokenBucket(limits["rate"], limits["burst"])
+        self.slots = asyncio.Semaphore(limits["max_in_flight"])
+        self.lock = asyncio.Lock()
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "errors": 0,
+                      "wait_seconds": 0.0, "busy_seconds": 0.0, "in_flight": 0, "max_in_flight_seen": 0}
+
+
+class HostScheduler:
+    """Politeness gate that every navigation and HTTP fetch goes through.
+
+    Each host gets a token bucket, a cap on concurrent requests and a
+    shared backoff window that opens whenever the host answers 429/503.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = limits or HOST_LIMITS
+        self.hosts = {}
+
+    def reset(self):
+        # Semaphores and locks belong to the running event loop
+        self.hosts = {}
+
+    def host_state(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = HostState(self.limits.get(host, self.limits["default"]))
+        return self.hosts[host]
+
+    async def _wait_turn(self, state):
+        started = time.monotonic()
+        async with state.lock:
+            delay = state.blocked_until - time.monotonic()
+            if delay > 0: await asyncio.sleep(delay)
+            await state.bucket.acquire()
+            await asyncio.sleep(random.uniform(0, JITTER))
+        state.stats["wait_seconds"] += time.monotonic() - started
+
+    def _backoff(self, state, response):
+        state.failures += 1
+        delay = min(BACKOFF_MAX, BACKOFF_BASE ** state.failures) + random.uniform(0, 1)
+        retry_after = response.headers.get("retry-after") if response else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(BACKOFF_MAX, int(retry_after)))
+        state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+        return delay
+
+    async def request(self, url, send):
+        # `send` performs the actual request and returns a response with .status
+        host = urlparse(url).hostname or "default"
+        state = self.host_state(host)
+        response = None
+        for attempt in range(MAX_RETRIES + 1):
+            await self._wait_turn(state)
+            async with state.slots:
+                state.stats["requests"] += 1
+                state.stats["in_flight"] += 1
+                state.stats["max_in_flight_seen"] = max(state.stats["max_in_flight_seen"], state.stats["in_flight"])
+                started = time.monotonic()
+                try:
+                    response = await send()
+                except Exception:
+                    state.stats["errors"] += 1
+                    raise
+                finally:
+                    state.stats["in_flight"] -= 1
+                    state.stats["busy_seconds"] += time.monotonic() - started
+
+            if response is None or response.status not in RETRY_STATUSES:
+                state.failures = 0
+                return response
+
+            state.stats["throttled"] += 1
+            if attempt == MAX_RETRIES: break
+            state.stats["retries"] += 1
+            delay = self._backoff(state, response)
+            print(f"  Throttle: {host} answered {response.status}, backing off {delay:.1f}s")
+        return response
+
+    async def goto(self, page, url, **kwargs):
+        return await self.request(url, lambda: page.goto(url, **kwargs))
+
+    async def fetch(self, request_context, method, url, **kwargs):
+        send = getattr(request_context, method)
+        return await self.request(url, lambda: send(url, **kwargs))
+
+    def stats(self):
+        return {host: dict(state.stats) for host, state in self.hosts.items()}
+
+    def print_stats(self):
+        print("Throttle stats:")
+        for host, s in self.stats().items():
+            print(f"  {host}: requests={s['requests']} retries={s['retries']} throttled={s['throttled']} "
+                  f"errors={s['errors']} wait={s['wait_seconds']:.1f}s busy={s['busy_seconds']:.1f}s "
+                  f"max_in_flight={s['max_in_flight_seen']}")
+
+
+# Shared by every scraper in this process
+scheduler = HostScheduler()